@@ -0,0 +1,22 @@
+import asyncio
+from picraft import World, BlockHitEvent
+
+world = World()
+
+async def poll_events():
+    loop = asyncio.get_running_loop()
+    while True:
+        # poll() and say() both wait for the server; run them in a thread so
+        # that the rest of the application isn't held up in the meantime
+        events = await loop.run_in_executor(None, world.events.poll)
+        for event in events:
+            # poll() may also return chat posts (on Raspberry Juice); only
+            # block hits have a face and position
+            if isinstance(event, BlockHitEvent):
+                await loop.run_in_executor(None, world.say,
+                    'Player %d hit face %s of block at %d,%d,%d' % (
+                        event.player.player_id, event.face,
+                        event.pos.x, event.pos.y, event.pos.z))
+        await asyncio.sleep(0.1)
+
+asyncio.run(poll_events())
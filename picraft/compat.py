@@ -204,3 +204,16 @@ if sys.version_info < (3, 3):
             return range(range_start, range_stop, range_step)
 else:
     range = range
+
+
+# math.hypot only accepts more than two coordinates from Python 3.8 onwards.
+# Prior to that we fall back to summing the squares ourselves (with
+# multiplication rather than ** 2 which is considerably slower)
+
+if sys.version_info < (3, 8):
+    import math
+
+    def hypot(x, y, z):
+        return math.sqrt(x * x + y * y + z * z)
+else:
+    from math import hypot
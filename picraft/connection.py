@@ -108,6 +108,8 @@ class Connection(object):
 
     .. automethod:: transact
 
+    .. automethod:: batch_transact
+
     .. automethod:: batch_start
 
     .. automethod:: batch_send
@@ -146,32 +148,26 @@ class Connection(object):
         # This is effectively an interactive protocol, so disable Nagle's
         # algorithm for better performance
         self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Scripts (especially event loops) may hold the connection open for
+        # long periods; keep-alives ensure a dead server is eventually noticed
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
         self._socket.connect((host, port))
-        self._rfile = self._socket.makefile('rb', -1)
-        self._wfile = self._socket.makefile('wb', 0) # no buffering for writes
+        self._rbuf = bytearray()
         self._directions = {} # temp space for calculated direction
         self.timeout = timeout
         self.encoding = encoding
-        # Determine what version of Minecraft we're talking to. Sadly, nobody
-        # seems to have thought about implementating an explicit means of
-        # doing this (a connection message, a getVersion() call, etc.) so
-        # we're relying on observed differences in implementation here...
-        self.ignore_errors = False
-        try:
-            test_result = self.transact('foo()')
-        except CommandError:
-            self._server_version = 'raspberry-juice'
-        except NoResponse:
-            self._server_version = 'minecraft-pi'
-        else:
-            raise CommandError('unexpected response to foo() test: %s' %
-                    test_result)
         self.ignore_errors = ignore_errors
+        # The server version is determined lazily (see server_version) as
+        # the test costs a round-trip (and a full timeout on minecraft-pi)
+        # which many scripts never need to pay
+        self._server_version = None
 
     def __repr__(self):
         host, port = self._socket.getpeername()
+        # Don't use server_version here; the repr of an object mustn't cause a
+        # network round-trip (and a timeout on Minecraft Pi)
         return '<Connection host="%s", port=%d, server_version="%s">' % (
-                host, port, self._server_version)
+                host, port, self._server_version or 'unknown')
 
     @property
     def server_version(self):
@@ -179,9 +175,41 @@ class Connection(object):
         Returns an object (currently just a string) representing the version
         of the Minecraft server we're talking to. Presently this is just
         ``'minecraft-pi'`` or ``'raspberry-juice'``.
+
+        The version is determined the first time this attribute is queried
+        and cached thereafter.
         """
+        if self._server_version is None:
+            with self._lock:
+                if self._server_version is None:
+                    self._server_version = self._query_version()
         return self._server_version
 
+    def _query_version(self):
+        """
+        Determine what version of Minecraft we're talking to. Sadly, nobody
+        seems to have thought about implementating an explicit means of doing
+        this (a connection message, a getVersion() call, etc.) so we're relying
+        on observed differences in implementation here. This must be called
+        with :attr:`_lock` held.
+        """
+        # Remove any outstanding "Fail" responses from prior commands so they
+        # can't be mistaken for the response to our test
+        if self._socket:
+            self._drain()
+        ignore_errors, self.ignore_errors = self.ignore_errors, False
+        try:
+            self._send('foo()')
+            test_result = self._receive(required=True)
+        except CommandError:
+            return 'raspberry-juice'
+        except NoResponse:
+            return 'minecraft-pi'
+        finally:
+            self.ignore_errors = ignore_errors
+        raise CommandError('unexpected response to foo() test: %s' %
+                test_result)
+
     def close(self):
         """
         Closes the connection.
@@ -195,12 +223,6 @@ class Connection(object):
         except BatchNotStarted:
             pass
         with self._lock:
-            if self._rfile:
-                self._rfile.close()
-                self._rfile = None
-            if self._wfile:
-                self._wfile.close()
-                self._wfile = None
             if self._socket:
                 self._socket.shutdown(socket.SHUT_RDWR)
                 self._socket.close()
@@ -208,9 +230,11 @@ class Connection(object):
 
     def _readable(self, timeout):
         """
-        Determines whether the socket is readable within the given timeout.
+        Determines whether a line is readable within the given timeout.
         """
-        return bool(select.select([self._socket], [], [], timeout)[0])
+        return (
+            b'\n' in self._rbuf or
+            bool(select.select([self._socket], [], [], timeout)[0]))
 
     def _drain(self):
         """
@@ -218,24 +242,47 @@ class Connection(object):
         used to ensure that any "Fail" messages are removed prior to executing
         something for which we expect a result.
         """
+        del self._rbuf[:]
         while True:
             if not self._readable(0):
                 break
             self._socket.recv(1500)
 
+    def _readline(self):
+        """
+        Read a line (including its newline terminator) from the socket. We
+        manage the read buffer ourselves (rather than using a file-object) so
+        that :meth:`_readable` can account for lines that have already been
+        received; this matters when several replies arrive together.
+        """
+        while True:
+            i = self._rbuf.find(b'\n')
+            if i >= 0:
+                result = bytes(self._rbuf[:i + 1])
+                del self._rbuf[:i + 1]
+                return result
+            data = self._socket.recv(4096)
+            if not data:
+                raise ConnectionClosed('connection closed by server')
+            self._rbuf.extend(data)
+
     def _send(self, buf):
         """
         Write *buf* (suitably encoded) to the socket.
         """
         if not self._socket:
             raise ConnectionClosed('connection closed')
-        if not buf.endswith('\n'):
-            buf += '\n'
-        buf = buf.encode(self.encoding)
+        if not isinstance(buf, bytes):
+            buf = buf.encode(self.encoding)
+        if not buf.endswith(b'\n'):
+            buf += b'\n'
         if self.ignore_errors:
             self._drain()
-        self._wfile.write(buf)
-        logger.debug('>: %r', buf)
+        # An unbuffered socket file may write only part of a large buffer
+        # (e.g. a big batch); sendall keeps going until everything is sent
+        self._socket.sendall(buf)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('>: %r', buf)
 
     def _receive(self, required=False):
         """
@@ -254,8 +301,9 @@ class Connection(object):
             if required and not self.ignore_errors:
                 raise NoResponse('no response received')
             return
-        result = self._rfile.readline()
-        logger.debug('<: %r', result)
+        result = self._readline()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('<: %r', result)
         result = result.decode(self.encoding).rstrip('\n')
         if result == 'Fail':
             raise CommandError('an error occurred')
@@ -302,6 +350,45 @@ class Connection(object):
             self._send(buf)
             return self._receive(required=True)
 
+    def batch_transact(self, bufs, return_errors=False):
+        """
+        Transmits each string in *bufs*, and returns a list of the replies.
+
+        This method is equivalent to calling :meth:`transact` for each item in
+        *bufs*, except that all the requests are transmitted together before
+        any replies are read. Hence, the whole sequence costs a single network
+        round-trip instead of one per request.
+
+        If any reply is "Fail", the remaining replies are still read (to keep
+        the connection in sync) before :exc:`~picraft.exc.CommandError` is
+        raised. If *return_errors* is ``True``, nothing is raised; instead the
+        :exc:`~picraft.exc.CommandError` for each failed request takes the
+        place of its reply in the list returned.
+
+        .. note::
+
+            As replies are matched to requests by order, this method must only
+            be used with commands that always produce a reply (e.g. "getters").
+            Like :meth:`transact`, it ignores the batch mechanism entirely.
+        """
+        bufs = list(bufs)
+        if not bufs:
+            return []
+        with self._lock:
+            self._send('\n'.join(bufs))
+            result = []
+            error = None
+            for buf in bufs:
+                try:
+                    result.append(self._receive(required=True))
+                except CommandError as e:
+                    result.append(e if return_errors else None)
+                    if error is None:
+                        error = e
+            if error is not None and not return_errors:
+                raise error
+            return result
+
     def batch_start(self):
         """
         Starts a new batch transmission.
@@ -346,7 +433,9 @@ class Connection(object):
             raise BatchNotStarted('no batch in progress')
         try:
             if self._local.batch:
-                buf = '\n'.join(self._local.batch)
+                buf = b'\n'.join(
+                    b if isinstance(b, bytes) else b.encode(self.encoding)
+                    for b in self._local.batch)
                 with self._lock:
                     self._send(buf)
                     try:
@@ -89,17 +89,47 @@ import logging
 import threading
 import time
 import warnings
-from collections import namedtuple, Container
-from weakref import WeakSet
+from collections import namedtuple, defaultdict, Container
+from weakref import WeakValueDictionary
 from functools import update_wrapper
+from itertools import chain
 from types import FunctionType
+try:
+    from queue import Queue, Full, Empty
+except ImportError:
+    # Py2 compat
+    from Queue import Queue, Full, Empty
 
-from .exc import ConnectionClosed, NoHandlersWarning
+from .exc import ConnectionClosed, CommandError, NoHandlersWarning
 from .vector import Vector
 from .player import Player
 
 logger = logging.getLogger('picraft')
 
+# The block faces in the order of the face indexes the server reports in
+# block hit events. Events share these string objects (see _face_test)
+_FACES = ('y-', 'y+', 'z-', 'z+', 'x-', 'x+')
+
+# The same faces keyed by the face index as it appears in the server's reply;
+# looking up the digit directly avoids converting it with int()
+_FACE_CODES = {str(i): face for i, face in enumerate(_FACES)}
+
+# A small cache of the positions of hit blocks, keyed by the position's string
+# representation. The same few blocks (doors, buttons, etc.) tend to be hit
+# repeatedly and constructing a Vector is comparatively expensive
+_HIT_POSITIONS = {}
+
+
+def _hit_pos(s):
+    try:
+        return _HIT_POSITIONS[s]
+    except KeyError:
+        if len(_HIT_POSITIONS) >= 256:
+            _HIT_POSITIONS.clear()
+        x, y, z = s.split(',')
+        pos = _HIT_POSITIONS[s] = Vector(int(x), int(y), int(z))
+        return pos
+
 
 class BlockHitEvent(namedtuple('BlockHitEvent', ('pos', 'face', 'player'))):
     """
@@ -135,22 +165,14 @@ class BlockHitEvent(namedtuple('BlockHitEvent', ('pos', 'face', 'player'))):
         hit the block.
     """
 
+    __slots__ = () # workaround python issue #24931
+
     @classmethod
-    def from_string(cls, connection, s):
-        v, f, p = s.rsplit(',', 2)
-        return cls(Vector.from_string(v), {
-            0: 'y-',
-            1: 'y+',
-            2: 'z-',
-            3: 'z+',
-            4: 'x-',
-            5: 'x+',
-            }[int(f)], Player(connection, int(p)))
-
-    @property
-    def __dict__(self):
-        # Ensure __dict__ property works in Python 3.3 and above.
-        return super(BlockHitEvent, self).__dict__
+    def from_string(cls, connection, s, get_player=None):
+        pos, f, p = s.rsplit(',', 2)
+        if get_player is None:
+            get_player = lambda pid: Player(connection, pid)
+        return cls(_hit_pos(pos), _FACE_CODES[f], get_player(int(p)))
 
     def __repr__(self):
         return '<BlockHitEvent pos=%s face=%r player=%d>' % (
@@ -184,10 +206,7 @@ class PlayerPosEvent(namedtuple('PlayerPosEvent', ('old_pos', 'new_pos', 'player
         moved.
     """
 
-    @property
-    def __dict__(self):
-        # Ensure __dict__ property works in Python 3.3 and above.
-        return super(PlayerPosEvent, self).__dict__
+    __slots__ = () # workaround python issue #24931
 
     def __repr__(self):
         return '<PlayerPosEvent old_pos=%s new_pos=%s player=%d>' % (
@@ -218,15 +237,14 @@ class ChatPostEvent(namedtuple('ChatPostEvent', ('message', 'player'))):
         moved.
     """
 
+    __slots__ = () # workaround python issue #24931
+
     @classmethod
-    def from_string(cls, connection, s):
+    def from_string(cls, connection, s, get_player=None):
         p, m = s.split(',', 1)
-        return cls(m, Player(connection, int(p)))
-
-    @property
-    def __dict__(self):
-        # Ensure __dict__ property works in Python 3.3 and above.
-        return super(ChatPostEvent, self).__dict__
+        if get_player is None:
+            get_player = lambda pid: Player(connection, pid)
+        return cls(m, get_player(int(p)))
 
     def __repr__(self):
         return '<ChatPostEvent message=%s player=%d>' % (
@@ -239,15 +257,16 @@ class IdleEvent(namedtuple('IdleEvent', ())):
     last poll. This is only used if :attr:`Events.include_idle` is ``True``.
     """
 
-    @property
-    def __dict__(self):
-        # Ensure __dict__ property works in Python 3.3 and above.
-        return super(IdleEvent, self).__dict__
+    __slots__ = () # workaround python issue #24931
 
     def __repr__(self):
         return '<IdleEvent>'
 
 
+# Idle events carry no state, so a single instance serves for all of them
+_IDLE_EVENT = IdleEvent()
+
+
 class Events(object):
     """
     This class implements the :attr:`~picraft.world.World.events` attribute.
@@ -295,11 +314,74 @@ class Events(object):
 
     def __init__(self, connection, poll_gap=0.1, include_idle=False):
         self._connection = connection
-        self._handlers = []
-        self._handler_instances = WeakSet()
+        # Handlers are indexed by the class of event they handle so that
+        # process() need only consider those relevant to each event. The
+        # handlers are kept in tuples which are replaced (rather than
+        # modified) on registration; iteration is quicker, and handlers
+        # registered while process() is running can't upset it
+        self._handlers = {
+            BlockHitEvent: (),
+            PlayerPosEvent: (),
+            ChatPostEvent: (),
+            IdleEvent: (),
+            }
+        self._hit_index = {}
+        self._hit_scan = ()
+        # Instances of classes decorated with has_handlers, indexed by their
+        # exact class, then by id (iterating the values of a weak dictionary
+        # is a little quicker than iterating a WeakSet)
+        self._handler_instances = defaultdict(WeakValueDictionary)
+        self._pool = HandlerPool()
+        self._stopped = threading.Event()
         self._poll_gap = poll_gap
+        self._max_poll_gap = None
         self._include_idle = include_idle
+        self._conflate = False
+        self._player_backoff = False
+        # Each tracked player's id mapped to a (player, position) tuple; the
+        # Player is constructed once, when tracking starts, rather than each
+        # time the player moves
         self._track_players = {}
+        # The last reply to each tracked player's position query; if a reply
+        # is unchanged there's no need to parse it
+        self._raw_positions = {}
+        # For each tracked player, the number of consecutive queries that
+        # found them stationary, and the number of polls to skip before
+        # querying them again (see player_backoff)
+        self._still = {}
+        self._skip = {}
+        self._players = {}
+
+    def _player(self, player_id):
+        """
+        Returns the :class:`~picraft.player.Player` for *player_id*. Instances
+        are cached as the same few players tend to generate the vast majority
+        of events. Player ids are entity ids, which the server allocates
+        afresh each time a player joins, so the cache is simply emptied once
+        it grows beyond a handful of players.
+        """
+        try:
+            return self._players[player_id]
+        except KeyError:
+            if len(self._players) >= 64:
+                self._players.clear()
+            player = self._players[player_id] = Player(
+                self._connection, player_id)
+            return player
+
+    def _query_positions(self, pids):
+        """
+        Returns a dict mapping each of *pids* to the position of that player,
+        querying all the positions in a single round-trip.
+        """
+        pids = list(pids)
+        replies = self._connection.batch_transact(
+            'entity.getPos(%d)' % pid for pid in pids)
+        self._raw_positions.update(zip(pids, replies))
+        return {
+            pid: Vector.from_string(reply, type=float).round(1)
+            for pid, reply in zip(pids, replies)
+            }
 
     def _get_poll_gap(self):
         return self._poll_gap
@@ -308,8 +390,9 @@ class Events(object):
     poll_gap = property(_get_poll_gap, _set_poll_gap, doc="""\
         The length of time (in seconds) to pause during :meth:`main_loop`.
 
-        This property specifies the length of time to wait at the end of each
-        iteration of :meth:`main_loop`. By default this is 0.1 seconds.
+        This property specifies the length of time between the start of each
+        iteration of :meth:`main_loop`; whatever remains of it after events
+        have been processed is spent waiting. By default this is 0.1 seconds.
 
         The purpose of the pause is to give event handlers executing in the
         background time to communicate with the Minecraft server. Setting this
@@ -318,22 +401,45 @@ class Events(object):
         resulting in "choppy" performance.
         """)
 
+    def _get_max_poll_gap(self):
+        if self._max_poll_gap is None:
+            return self._poll_gap
+        return self._max_poll_gap
+    def _set_max_poll_gap(self, value):
+        self._max_poll_gap = None if value is None else float(value)
+    max_poll_gap = property(_get_max_poll_gap, _set_max_poll_gap, doc="""\
+        The longest length of time (in seconds) that :meth:`main_loop` will
+        pause between polls when no events are occurring.
+
+        By default this is equal to :attr:`poll_gap`, so the event loop polls
+        at a constant rate. If set to a larger value, each iteration of
+        :meth:`main_loop` which finds no events lengthens the gap by half (or
+        to 0.01 seconds, if it was shorter than that), up to this limit, and an
+        iteration which does find events immediately
+        returns the gap to :attr:`poll_gap`. This reduces the load on the
+        server (and the Pi) when the world is quiet at the cost of a slightly
+        slower response to the first event after a quiet period. Setting this
+        to ``None`` restores the default.
+        """)
+
     def _get_track_players(self):
-        return self._track_players.keys()
+        return frozenset(self._track_players)
     def _set_track_players(self, value):
         try:
-            self._track_players = {
-                pid: Player(self._connection, pid).pos.round(1)
-                for pid in value
-                }
+            pids = list(value)
         except TypeError:
             if not isinstance(value, int):
                 raise ValueError(
                         'track_players value must be a player id '
                         'or a sequence of player ids')
-            self._track_players = {
-                value: Player(self._connection, value).pos.round(1)
-                }
+            pids = [value]
+        self._raw_positions.clear()
+        self._track_players = {
+            pid: (self._player(pid), pos)
+            for pid, pos in self._query_positions(pids).items()
+            }
+        self._still.clear()
+        self._skip.clear()
         if self._connection.server_version != 'raspberry-juice':
             # Filter out calculated directions for untracked players
             self._connection._directions = {
@@ -346,13 +452,16 @@ class Events(object):
 
         By default the :meth:`poll` method will not produce player position
         events (:class:`PlayerPosEvent`). Producing these events requires extra
-        interactions with the Minecraft server (one for each player tracked)
-        which slow down response to block hit events.
+        interactions with the Minecraft server (one query for each player
+        tracked, although these are sent in the same round-trip as the queries
+        for other events) which slow down response to block hit events.
 
         If you wish to track player positions, set this attribute to the set of
         player ids you wish to track and their positions will be stored.  The
         next time :meth:`poll` is called it will query the positions for all
         specified players and fire player position events if they have changed.
+        If a tracked player's position can't be queried (typically because
+        they have left the server) they are removed from this set.
 
         Given that the :attr:`~picraft.world.World.players` attribute
         represents a dictionary mapping player ids to players, if you wish to
@@ -370,6 +479,45 @@ class Events(object):
         generated by :meth:`poll`. This attribute defaults to ``False``.
         """)
 
+    def _get_player_backoff(self):
+        return self._player_backoff
+    def _set_player_backoff(self, value):
+        self._player_backoff = bool(value)
+        self._still.clear()
+        self._skip.clear()
+    player_backoff = property(_get_player_backoff, _set_player_backoff, doc="""\
+        If ``True``, query the positions of stationary players less often.
+        This attribute defaults to ``False``.
+
+        When :attr:`track_players` includes players that are not moving, the
+        position queries for them are wasted. With this attribute set, each
+        time a player is found not to have moved, the number of polls before
+        they are next queried doubles, up to a maximum of one query every 16
+        polls. As soon as a player is seen to move, that player is queried
+        every poll once more. When any block hit event is received, all
+        players are.
+
+        The trade-off is that the first movement of a player that has been
+        stationary for a while may be reported up to 16 polls late.
+        """)
+
+    def _get_conflate(self):
+        return self._conflate
+    def _set_conflate(self, value):
+        self._conflate = bool(value)
+    conflate = property(_get_conflate, _set_conflate, doc="""\
+        If ``True``, identical block hit events occurring within a single
+        :meth:`poll` are collapsed into one. This attribute defaults to
+        ``False``.
+
+        In busy worlds a player may hit the same face of the same block
+        several times between polls; when handlers only care *that* a block
+        was hit (rather than how many times) this avoids executing them
+        repeatedly for the same thing. Note that player position events never
+        need conflating as :meth:`poll` produces at most one per tracked
+        player.
+        """)
+
     def clear(self):
         """
         Forget all pending events that have not yet been retrieved with
@@ -380,7 +528,13 @@ class Events(object):
         useful for ensuring that events subsequently retrieved definitely
         occurred *after* the call to :meth:`clear`.
         """
-        self._set_track_players(self._get_track_players())
+        # Re-query the positions of all tracked players so that movement
+        # prior to this call is forgotten too
+        tracked = self._track_players
+        for pid, pos in self._query_positions(tracked).items():
+            tracked[pid] = (tracked[pid][0], pos)
+        self._still.clear()
+        self._skip.clear()
         self._connection.send('events.clear()')
 
     def poll(self):
@@ -400,59 +554,187 @@ class Events(object):
             >>> w.events.poll()
             [<IdleEvent>]
         """
-        def player_pos_events(positions):
-            for pid, old_pos in positions.items():
-                player = Player(self._connection, pid)
-                new_pos = player.pos.round(1)
+        return list(self._poll_iter())
+
+    def _poll_iter(self, types=None):
+        """
+        Generator version of :meth:`poll`, used by :meth:`process` to dispatch
+        events as they are parsed rather than building a list of them first.
+
+        If *types* is specified, it is the collection of event classes that
+        the caller wants. Block hit and chat post events are still fetched
+        from the server (so they don't queue up there) but only parsed if
+        their class is in *types*.
+        """
+        juice = self._connection.server_version == 'raspberry-juice'
+        tracked = self._track_players
+        if self._player_backoff:
+            pids = []
+            for pid in tracked:
+                if self._skip.get(pid):
+                    self._skip[pid] -= 1
+                else:
+                    pids.append(pid)
+        else:
+            pids = list(tracked)
+        # Send all the queries for this poll in a single round-trip; this is
+        # far quicker than waiting for the reply to each in turn
+        commands = ['entity.getPos(%d)' % pid for pid in pids]
+        commands.append('events.block.hits()')
+        if juice:
+            commands.append('events.chat.posts()')
+        replies = self._connection.batch_transact(commands, return_errors=True)
+        hits_reply = replies[len(pids)]
+        chats_reply = replies[len(pids) + 1] if juice else ''
+        # A failed event query means there's nothing to lose by raising now;
+        # failed position queries are dealt with per player below as raising
+        # would discard the events fetched alongside them
+        for reply in (hits_reply, chats_reply):
+            if isinstance(reply, CommandError):
+                raise reply
+
+        def player_pos_events():
+            for pid, reply in zip(pids, replies):
+                if isinstance(reply, CommandError):
+                    # Most likely the player has left the server (Raspberry
+                    # Juice fails the query in this case); stop tracking them
+                    logger.warning(
+                        'Failed to query position of player %d; no longer '
+                        'tracking them', pid)
+                    tracked.pop(pid, None)
+                    self._raw_positions.pop(pid, None)
+                    self._still.pop(pid, None)
+                    self._skip.pop(pid, None)
+                    continue
+                player, old_pos = tracked[pid]
+                if reply == self._raw_positions.get(pid):
+                    new_pos = old_pos
+                else:
+                    self._raw_positions[pid] = reply
+                    new_pos = Vector.from_string(reply, type=float).round(1)
+                if self._player_backoff:
+                    if old_pos == new_pos:
+                        still = self._still.get(pid, 0) + 1
+                        self._skip[pid] = 2 ** min(still, 4) - 1
+                    else:
+                        still = 0
+                    self._still[pid] = still
                 if old_pos != new_pos:
-                    if self._connection.server_version != 'raspberry-juice':
+                    # Record the new position before yielding; the event is
+                    # dispatched while we're suspended and a handler raising
+                    # an exception mustn't leave the old position behind
+                    tracked[pid] = (player, new_pos)
+                    if not juice:
                         # Calculate directions for tracked players on platforms
                         # which don't provide it natively
                         self._connection._directions[pid] = new_pos - old_pos
                     yield PlayerPosEvent(old_pos, new_pos, player)
-                positions[pid] = new_pos
 
         def block_hit_events():
-            s = self._connection.transact('events.block.hits()')
-            if s:
-                for e in s.split('|'):
-                    yield BlockHitEvent.from_string(self._connection, e)
+            if hits_reply:
+                if self._player_backoff:
+                    # A block hit implies someone's active; resume querying
+                    # all tracked players every poll
+                    self._still.clear()
+                    self._skip.clear()
+                if types is not None and BlockHitEvent not in types:
+                    return
+                hits = hits_reply.split('|')
+                if self._conflate:
+                    seen = set()
+                    hits = [
+                        e for e in hits
+                        if not (e in seen or seen.add(e))
+                        ]
+                for e in hits:
+                    yield BlockHitEvent.from_string(
+                        self._connection, e, self._player)
 
         def chat_post_events():
-            if self._connection.server_version == 'raspberry-juice':
-                s = self._connection.transact('events.chat.posts()')
-                if s:
-                    for e in s.split('|'):
-                        yield ChatPostEvent.from_string(self._connection, e)
-
-        events = list(player_pos_events(self._track_players)) + list(block_hit_events()) + list(chat_post_events())
-
-        if events:
-            return events
-        elif self._include_idle:
-            return [IdleEvent()]
-        else:
-            return []
+            if chats_reply:
+                if types is not None and ChatPostEvent not in types:
+                    return
+                for e in chats_reply.split('|'):
+                    yield ChatPostEvent.from_string(
+                        self._connection, e, self._player)
+
+        idle = True
+        for event in chain(
+                player_pos_events(),
+                block_hit_events(),
+                chat_post_events()):
+            idle = False
+            yield event
+        # Events that weren't parsed still mean the poll wasn't idle
+        if idle and self._include_idle and not (hits_reply or chats_reply):
+            if types is None or IdleEvent in types:
+                yield _IDLE_EVENT
 
     def main_loop(self):
         """
         Starts the event polling loop when using the decorator style of event
         handling (see :meth:`on_block_hit`).
 
-        This method will not return, so be sure that you have specified all
-        your event handlers before calling it. The event loop can only be
-        broken by an unhandled exception, or by closing the world's connection
-        (in the latter case the resulting :exc:`~picraft.exc.ConnectionClosed`
-        exception will be suppressed as it is assumed that you want to end the
-        script cleanly).
+        This method will not return until :meth:`stop` is called (typically
+        from an event handler or another thread), so be sure that you have
+        specified all your event handlers before calling it. The event loop
+        can also be broken by an unhandled exception, or by closing the
+        world's connection (in the latter case the resulting
+        :exc:`~picraft.exc.ConnectionClosed` exception will be suppressed as
+        it is assumed that you want to end the script cleanly).
         """
+        if not any(self._handlers.values()):
+            warnings.warn(NoHandlersWarning(
+                'main_loop started with no event handlers registered'))
         logger.info('Entering event loop')
         try:
+            gap = self.poll_gap
             while True:
-                self.process()
-                time.sleep(self.poll_gap)
+                start = time.time()
+                if self.process():
+                    gap = self.poll_gap
+                else:
+                    # Back off (up to max_poll_gap) while nothing's happening;
+                    # growth starts from 10ms at least, or a poll_gap of 0
+                    # would never grow
+                    gap = max(self.poll_gap, min(
+                        self.max_poll_gap, max(0.01, gap * 1.5)))
+                # The server has no means of notifying us of events, so we
+                # must poll. Rather than sleeping for the full gap after
+                # processing, only sleep for whatever remains of it; this keeps
+                # the polling rate steady regardless of how long handlers take
+                elapsed = time.time() - start
+                if self._stopped.wait(max(0.0, min(gap, gap - elapsed))):
+                    logger.info('Stop requested; exiting event loop')
+                    break
         except ConnectionClosed:
             logger.info('Connection closed; exiting event loop')
+        finally:
+            self._stopped.clear()
+
+    def stop(self):
+        """
+        Causes :meth:`main_loop` to return once the current iteration has
+        finished.
+
+        As the event loop waits for this rather than simply sleeping between
+        polls, it returns promptly even when :attr:`poll_gap` (or
+        :attr:`max_poll_gap`) is large. If the event loop isn't running, the
+        next call to :meth:`main_loop` will return after a single iteration.
+        """
+        self._stopped.set()
+
+    def close(self):
+        """
+        Stops :meth:`main_loop` (if it is running) and shuts down the
+        background threads used to execute threaded handlers. Any threaded
+        handler calls which have not yet started are discarded.
+
+        This is called automatically when the :class:`~picraft.world.World`
+        is used as a context manager.
+        """
+        self.stop()
+        self._pool.shutdown()
 
     def process(self):
         """
@@ -464,11 +746,44 @@ class Events(object):
         implementing their own event loop manually, or when their (presumably
         non-threaded) event handler is engaged in a long operation and they
         wish to permit events to be processed in the meantime.
+
+        Returns the number of events received from the server for which
+        handlers are registered (excluding any :class:`IdleEvent`). Events of
+        other types are fetched from the server but not parsed. If no event
+        handlers are registered, the server is not polled at all and the
+        result is 0.
         """
-        for event in self.poll():
-            for handler in self._handlers:
-                if handler.matches(event):
+        types = [cls for cls, handlers in self._handlers.items() if handlers]
+        if not types:
+            return 0
+        count = 0
+        for event in self._poll_iter(types):
+            cls = type(event)
+            if cls is IdleEvent:
+                # Idle events are the most frequent when nothing's happening,
+                # and idle handlers have no filters to test
+                for handler in self._handlers[IdleEvent]:
+                    handler.execute(event)
+                continue
+            if cls not in types:
+                # Player positions are always polled while players are
+                # tracked, but only count when something handles them
+                continue
+            count += 1
+            if cls is BlockHitEvent:
+                handlers = self._hit_index.get(event.pos, self._hit_scan)
+            else:
+                handlers = self._handlers[cls]
+            test = event
+            if handlers and cls is PlayerPosEvent:
+                # Position filters match against tile positions; floor the
+                # event's positions once here rather than once per handler
+                test = PlayerPosEvent(
+                    event.old_pos.floor(), event.new_pos.floor(), event.player)
+            for handler in handlers:
+                if handler._matches(test):
                     handler.execute(event)
+        return count
 
     def has_handlers(self, cls):
         """
@@ -538,13 +853,13 @@ class Events(object):
             warnings.warn(NoHandlersWarning('no handlers found in %s' % cls))
             return cls
         # Replace __init__ on the class with a closure that adds every instance
-        # constructed to self._handler_instances. As this is a WeakSet,
-        # instances that die will be implicitly removed
+        # constructed to self._handler_instances. As these are weak
+        # dictionaries, instances that die will be implicitly removed
         old_init = getattr(cls, '__init__', None)
         def __init__(this, *args, **kwargs):
             if old_init:
                 old_init(this, *args, **kwargs)
-            self._handler_instances.add(this)
+            self._handler_instances[this.__class__][id(this)] = this
         if old_init:
             update_wrapper(__init__, old_init)
         cls.__init__ = __init__
@@ -562,14 +877,13 @@ class Events(object):
                 # search the set of instances of classes which were registered
                 # as having handlers (by @has_handlers)
                 for cls in f._picraft_classes:
-                    for inst in self._handler_instances:
-                        # Check whether the instance has the right class; note
-                        # that we *don't* use isinstance() here as we want an
-                        # exact match
-                        if inst.__class__ == cls:
-                            # Bind the function to the instance via its
-                            # descriptor
-                            f.__get__(inst, cls)(event)
+                    # Instances are indexed by their exact class; note that we
+                    # *don't* want instances of sub-classes here (unless they
+                    # too were registered, in which case they'll be found
+                    # under their own class)
+                    for inst in self._handler_instances.get(cls, {}).values():
+                        # Bind the function to the instance via its descriptor
+                        f.__get__(inst, cls)(event)
         update_wrapper(handler, f)
         return handler
 
@@ -586,8 +900,9 @@ class Events(object):
         is set to ``True``.
         """
         def decorator(f):
-            self._handlers.append(
-                    IdleHandler(self._handler_closure(f), thread, multi))
+            handler = IdleHandler(self._handler_closure(f),
+                thread, multi, self._pool)
+            self._handlers[IdleEvent] += (handler,)
             f._picraft_classes = set()
             return f
         return decorator
@@ -628,13 +943,18 @@ class Events(object):
         in a particular direction, or decide when a player enters or leaves a
         particular area.
 
+        Lists and tuples of positions are copied when the handler is
+        registered, so later changes to them have no effect. Other containers
+        (such as sets) are used as they are, so a set of positions can be
+        changed after the handler is registered.
+
         Note that only players specified in :attr:`track_players` will generate
         player position events.
         """
         def decorator(f):
-            self._handlers.append(
-                    PlayerPosHandler(self._handler_closure(f),
-                        thread, multi, old_pos, new_pos))
+            handler = PlayerPosHandler(self._handler_closure(f),
+                thread, multi, self._pool, old_pos, new_pos)
+            self._handlers[PlayerPosEvent] += (handler,)
             f._picraft_classes = set()
             return f
         return decorator
@@ -656,6 +976,11 @@ class Events(object):
         The *face* parameter can be used to specify a face or sequence of
         faces for which the handler will be called.
 
+        Lists and tuples given for *pos* or *face* are copied when the handler
+        is registered, so later changes to them have no effect. Other
+        containers (such as sets) are used as they are, so a set of positions
+        can be changed after the handler is registered.
+
         For example, to specify that one handler should be called for hits
         on the top of any blocks, and another should be called only for hits
         on any face of block at the origin one could use the following code::
@@ -675,21 +1000,33 @@ class Events(object):
             world.events.main_loop()
 
         The *thread* parameter (which defaults to ``False``) can be used to
-        specify that the handler should be executed in its own background
-        thread, in parallel with other handlers.
+        specify that the handler should be executed in a background thread,
+        in parallel with other handlers.
 
         Finally, the *multi* parameter (which only applies when *thread* is
         ``True``) specifies whether multi-threaded handlers should be allowed
         to execute in parallel. When ``True`` (the default), threaded handlers
-        execute as many times as activated in parallel. When ``False``, a
-        single instance of a threaded handler is allowed to execute at any
-        given time; simultaneous activations are ignored (but not queued, as
-        with unthreaded handlers).
+        execute as many times as activated in parallel (up to the size of the
+        background thread pool; further activations are queued, and dropped if
+        too many are waiting). When ``False``, a single instance of a threaded
+        handler is allowed to execute at any given time; simultaneous
+        activations are ignored (but not queued, as with unthreaded handlers).
         """
         def decorator(f):
-            self._handlers.append(
-                    BlockHitHandler(self._handler_closure(f),
-                        thread, multi, pos, face))
+            handler = BlockHitHandler(self._handler_closure(f),
+                thread, multi, self._pool, pos, face)
+            self._handlers[BlockHitEvent] += (handler,)
+            # Handlers filtering on a single position are indexed by it so
+            # that process() need not test them against hits elsewhere. Each
+            # bucket also includes all handlers that can't be indexed, in
+            # registration order
+            if isinstance(pos, Vector):
+                self._hit_index[pos] = self._hit_index.get(
+                    pos, self._hit_scan) + (handler,)
+            else:
+                self._hit_scan += (handler,)
+                for key in list(self._hit_index):
+                    self._hit_index[key] += (handler,)
             f._picraft_classes = set()
             return f
         return decorator
@@ -730,26 +1067,210 @@ class Events(object):
             world.events.main_loop()
 
         The *thread* parameter (which defaults to ``False``) can be used to
-        specify that the handler should be executed in its own background
-        thread, in parallel with other handlers.
+        specify that the handler should be executed in a background thread,
+        in parallel with other handlers.
 
         Finally, the *multi* parameter (which only applies when *thread* is
         ``True``) specifies whether multi-threaded handlers should be allowed
         to execute in parallel. When ``True`` (the default), threaded handlers
-        execute as many times as activated in parallel. When ``False``, a
-        single instance of a threaded handler is allowed to execute at any
-        given time; simultaneous activations are ignored (but not queued, as
-        with unthreaded handlers).
+        execute as many times as activated in parallel (up to the size of the
+        background thread pool; further activations are queued, and dropped if
+        too many are waiting). When ``False``, a single instance of a threaded
+        handler is allowed to execute at any given time; simultaneous
+        activations are ignored (but not queued, as with unthreaded handlers).
         """
         def decorator(f):
-            self._handlers.append(
-                    ChatPostHandler(self._handler_closure(f),
-                        thread, multi, message))
+            handler = ChatPostHandler(self._handler_closure(f),
+                thread, multi, self._pool, message)
+            self._handlers[ChatPostEvent] += (handler,)
             f._picraft_classes = set()
             return f
         return decorator
 
 
+def _match_any(value):
+    return True
+
+
+def _contains_test(test):
+    """
+    Returns a membership predicate for the container *test*. Plain lists and
+    tuples are converted to a :class:`frozenset` so that membership is a hash
+    lookup rather than a scan; other containers (sets, or
+    :class:`~picraft.vector.vector_range`, etc.) are assumed to implement
+    membership efficiently themselves, and are used as is so that changes to
+    them affect the handler.
+    """
+    if isinstance(test, (list, tuple)):
+        try:
+            test = frozenset(test)
+        except TypeError:
+            # Unhashable members; fall back to the original container
+            pass
+    return test.__contains__
+
+
+def _pos_test(test):
+    """
+    Returns a predicate for the position filter *test*. The type of filter is
+    determined here, once, rather than every time an event is matched.
+    """
+    if test is None:
+        return _match_any
+    if isinstance(test, Vector):
+        return lambda pos: pos == test
+    if isinstance(test, Container):
+        return _contains_test(test)
+    raise TypeError(
+            "%r is not a valid position test; expected Vector or "
+            "sequence of Vector" % (test,))
+
+
+def _face_test(test):
+    """
+    Returns a predicate for the face filter *test*. The type of filter is
+    determined here, once, rather than every time an event is matched.
+    """
+    if test is None:
+        return _match_any
+    if isinstance(test, str):
+        if test in _FACES:
+            # Events built by from_string carry the face strings in _FACES;
+            # matching the corresponding object lets == succeed on identity
+            # without comparing characters. Events constructed elsewhere
+            # still match by value
+            test = _FACES[_FACES.index(test)]
+        return lambda face: face == test
+    if isinstance(test, Container):
+        return _contains_test(test)
+    raise TypeError(
+            "%r is not a valid face test; expected string or sequence "
+            "of strings" % (test,))
+
+
+def _message_test(test):
+    """
+    Returns a predicate for the chat message filter *test*. The type of filter
+    is determined here, once, rather than every time an event is matched.
+    """
+    if test is None:
+        return _match_any
+    if isinstance(test, str):
+        return lambda message: message == test
+    try:
+        return test.match
+    except AttributeError:
+        raise TypeError(
+                "%r is not a valid message test; expected string "
+                "or regular expression" % (test,))
+
+
+class HandlerPool(object):
+    """
+    This is an internal object used to execute threaded event handlers. Rather
+    than starting a new thread for every activation of a handler, calls are
+    placed in a bounded queue which is serviced by a small pool of background
+    threads. Threads are started as required up to *max_threads*.
+
+    If *max_queue* calls are already waiting for a thread, further calls are
+    dropped (and a warning logged) until the threads catch up. This prevents a
+    storm of events from consuming unbounded memory, or stalling the event
+    loop.
+    """
+
+    def __init__(self, max_threads=8, max_queue=64):
+        self._max_threads = max_threads
+        self._max_queue = max_queue
+        self._queue = Queue(max_queue)
+        self._lock = threading.Lock()
+        self._threads = []
+        # The number of workers waiting for a call that no submission has
+        # claimed yet, and the number of queued calls that found no worker to
+        # claim (these are taken by workers as they finish their current call)
+        self._idle = 0
+        self._backlog = 0
+
+    def submit(self, func, args=(), gate=None):
+        """
+        Queue *func* to be called with the tuple *args* in a background thread.
+        Returns ``True`` if the call was queued, or ``False`` if it was dropped
+        because the queue is full.
+
+        If *gate* is specified it must be an acquired lock, which the pool
+        releases once the call has finished, or when the call is dropped or
+        discarded without being made.
+        """
+        with self._lock:
+            try:
+                self._queue.put_nowait((func, args, gate))
+            except Full:
+                logger.warning('Threaded handler queue full; dropping event')
+                if gate is not None:
+                    gate.release()
+                return False
+            # Each call claims an idle worker, if there is one, so that a
+            # burst of calls doesn't wait on a single worker that all of them
+            # saw idle; otherwise start a new worker for it if we can
+            if self._idle:
+                self._idle -= 1
+            elif len(self._threads) < self._max_threads:
+                thread = threading.Thread(
+                    target=self._worker, args=(self._queue,))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+            else:
+                self._backlog += 1
+        return True
+
+    def shutdown(self):
+        """
+        Discard any queued calls (releasing their gates) and tell the
+        background threads to exit. Calls which are already executing are not
+        interrupted, and this method does not wait for them to finish. The
+        pool may still be used after this; threads will be started again as
+        required.
+        """
+        with self._lock:
+            queue, self._queue = self._queue, Queue(self._max_queue)
+            threads, self._threads = self._threads, []
+            self._idle = self._backlog = 0
+        try:
+            while True:
+                func, args, gate = queue.get_nowait()
+                if gate is not None:
+                    gate.release()
+        except Empty:
+            pass
+        for thread in threads:
+            try:
+                queue.put_nowait(None)
+            except Full:
+                break
+
+    def _worker(self, queue):
+        while True:
+            item = queue.get()
+            if item is None:
+                break
+            func, args, gate = item
+            try:
+                func(*args)
+            except Exception:
+                logger.exception('Error in threaded event handler')
+            finally:
+                if gate is not None:
+                    gate.release()
+            with self._lock:
+                if queue is not self._queue:
+                    # The pool was shut down while we were busy
+                    break
+                if self._backlog:
+                    self._backlog -= 1
+                else:
+                    self._idle += 1
+
+
 class EventHandler(object):
     """
     This is an internal object used to associate event handlers with their
@@ -758,17 +1279,25 @@ class EventHandler(object):
     The *action* parameter specifies the function to be run when a matching
     event is received from the server.
 
-    The *thread* parameter specifies whether the *action* will be launched in
-    its own background thread. If *multi* is ``False``, then the
-    :meth:`execute` method will ensure that any prior execution has finished
-    before launching another one.
+    The *thread* parameter specifies whether the *action* will be executed by
+    a background thread from *pool* (a :class:`HandlerPool`). If *multi* is
+    ``False``, then the :meth:`execute` method will ensure that any prior
+    execution has finished before launching another one.
+
+    Sub-classes combine their filters into a single predicate when they are
+    constructed and store it in :attr:`_matches`; :meth:`Events.process` calls
+    this directly rather than going through :meth:`matches`.
     """
 
-    def __init__(self, action, thread, multi):
+    __slots__ = ('action', 'thread', 'multi', '_pool', '_running', '_matches')
+
+    def __init__(self, action, thread, multi, pool):
         self.action = action
         self.thread = thread
         self.multi = multi
-        self._thread = None
+        self._pool = pool
+        self._running = threading.Lock()
+        self._matches = _match_any
 
     def execute(self, event):
         """
@@ -777,28 +1306,21 @@ class EventHandler(object):
         """
         if self.thread:
             if self.multi:
-                threading.Thread(target=self._execute_handler, args=(event,)).start()
-            elif not self._thread:
-                self._thread = threading.Thread(target=self._execute_single, args=(event,))
-                self._thread.start()
+                self._pool.submit(self.action, (event,))
+            elif self._running.acquire(False):
+                # The pool releases the lock once the action has finished
+                # (or if the call is dropped)
+                self._pool.submit(self.action, (event,), self._running)
         else:
-            self._execute_handler(event)
-
-    def _execute_single(self, event):
-        try:
-            self._execute_handler(event)
-        finally:
-            self._thread = None
-
-    def _execute_handler(self, event):
-        self.action(event)
+            self.action(event)
 
     def matches(self, event):
         """
         Tests whether or not *event* match all the filters for the handler that
-        this object represents.
+        this object represents. The caller is responsible for ensuring that
+        *event* is of the type the handler is registered for.
         """
-        raise NotImplementedError
+        return self._matches(event)
 
 
 class PlayerPosHandler(EventHandler):
@@ -810,29 +1332,25 @@ class PlayerPosHandler(EventHandler):
     specify the vectors (or sequences of vectors) that an event must transition
     across in order to activate this action. These filters must both match in
     order for the action to fire.
+
+    As the filters match tile positions, :meth:`matches` expects to be passed
+    an event with floored positions; :meth:`Events.process` takes care of
+    this so that each event is only floored once, regardless of the number of
+    handlers.
     """
 
-    def __init__(self, action, thread, multi, old_pos, new_pos):
-        super(PlayerPosHandler, self).__init__(action, thread, multi)
+    __slots__ = ('old_pos', 'new_pos')
+
+    def __init__(self, action, thread, multi, pool, old_pos, new_pos):
+        super(PlayerPosHandler, self).__init__(action, thread, multi, pool)
         self.old_pos = old_pos
         self.new_pos = new_pos
-
-    def matches(self, event):
-        return (
-                isinstance(event, PlayerPosEvent) and
-                self.matches_pos(self.old_pos, event.old_pos) and
-                self.matches_pos(self.new_pos, event.new_pos))
-
-    def matches_pos(self, test, pos):
-        if test is None:
-            return True
-        if isinstance(test, Vector):
-            return test == pos.floor()
-        if isinstance(test, Container):
-            return pos.floor() in test
-        raise TypeError(
-                "%r is not a valid position test; expected Vector or "
-                "sequence of Vector" % test)
+        if old_pos is not None or new_pos is not None:
+            match_old_pos = _pos_test(old_pos)
+            match_new_pos = _pos_test(new_pos)
+            self._matches = lambda event: (
+                    match_old_pos(event.old_pos) and
+                    match_new_pos(event.new_pos))
 
 
 class BlockHitHandler(EventHandler):
@@ -847,40 +1365,24 @@ class BlockHitHandler(EventHandler):
     to fire.
     """
 
-    def __init__(self, action, thread, multi, pos, face):
-        super(BlockHitHandler, self).__init__(action, thread, multi)
+    __slots__ = ('pos', 'face')
+
+    def __init__(self, action, thread, multi, pool, pos, face):
+        super(BlockHitHandler, self).__init__(action, thread, multi, pool)
         self.pos = pos
         if isinstance(face, bytes):
             face = face.decode('ascii')
         self.face = face
-
-    def matches(self, event):
-        return (
-                isinstance(event, BlockHitEvent) and
-                self.matches_pos(event.pos) and
-                self.matches_face(event.face))
-
-    def matches_pos(self, pos):
-        if self.pos is None:
-            return True
-        if isinstance(self.pos, Vector):
-            return self.pos == pos
-        if isinstance(self.pos, Container):
-            return pos in self.pos
-        raise TypeError(
-                "%r is not a valid position test; expected Vector or "
-                "sequence of Vector" % pos)
-
-    def matches_face(self, face):
-        if self.face is None:
-            return True
-        if isinstance(self.face, str):
-            return self.face == face
-        if isinstance(self.face, Container):
-            return face in self.face
-        raise TypeError(
-                "%r is not a valid face test; expected string or sequence "
-                "of strings" % face)
+        match_pos = _pos_test(pos)
+        match_face = _face_test(face)
+        if face is None:
+            if pos is not None:
+                self._matches = lambda event: match_pos(event.pos)
+        elif pos is None:
+            self._matches = lambda event: match_face(event.face)
+        else:
+            self._matches = lambda event: (
+                    match_pos(event.pos) and match_face(event.face))
 
 
 class ChatPostHandler(EventHandler):
@@ -892,28 +1394,16 @@ class ChatPostHandler(EventHandler):
     message that an event must contain in order to activate this action.
     """
 
-    def __init__(self, action, thread, multi, message):
-        super(ChatPostHandler, self).__init__(action, thread, multi)
+    __slots__ = ('message',)
+
+    def __init__(self, action, thread, multi, pool, message):
+        super(ChatPostHandler, self).__init__(action, thread, multi, pool)
         if isinstance(message, bytes):
             message = message.decode('ascii')
         self.message = message
-
-    def matches(self, event):
-        return (
-            isinstance(event, ChatPostEvent) and
-            self.matches_message(event.message))
-
-    def matches_message(self, message):
-        if self.message is None:
-            return True
-        if isinstance(self.message, str):
-            return self.message == message
-        try:
-            return self.message.match(message)
-        except AttributeError:
-            raise TypeError(
-                    "%r is not a valid message test; expected string"
-                    "or regular expression" % message)
+        match_message = _message_test(message)
+        if message is not None:
+            self._matches = lambda event: match_message(event.message)
 
 
 class IdleHandler(EventHandler):
@@ -921,5 +1411,4 @@ class IdleHandler(EventHandler):
     This class associates a handler with an idle event.
     """
 
-    def matches(self, event):
-        return isinstance(event, IdleEvent)
+    __slots__ = ()
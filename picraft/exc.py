@@ -112,7 +112,8 @@ class EmptySliceWarning(Warning):
 class NoHandlersWarning(Warning):
     """
     Warning raised when a class with no handlers is registered with
-    :meth:`~picraft.events.Events.has_handlers`
+    :meth:`~picraft.events.Events.has_handlers`, or when
+    :meth:`~picraft.events.Events.main_loop` is started with no handlers
     """
 
 class ParseWarning(Warning):
@@ -76,6 +76,8 @@ class Players(object):
     Thie class implements the :attr:`~picraft.world.World.players` attribute.
     """
 
+    __slots__ = ('_connection', '_cache')
+
     def __init__(self, connection):
         self._connection = connection
         self._cache = {}
@@ -138,6 +140,8 @@ class BasePlayer(object):
     Base class for players.
     """
 
+    __slots__ = ('_connection', '_player_id', '_prefix')
+
     def __init__(self, connection, prefix, player_id):
         self._connection = connection
         self._player_id = player_id
@@ -146,7 +150,7 @@ class BasePlayer(object):
     def _cmd(self, command, *args):
         if self._player_id is not None:
             args = (self._player_id,) + args
-        args = ','.join(str(arg) for arg in args)
+        args = ','.join(map(str, args))
         return '%s.%s(%s)' % (self._prefix, command, args)
 
     def _get_pos(self):
@@ -282,6 +286,8 @@ class Player(BasePlayer):
     the player.
     """
 
+    __slots__ = ()
+
     def __init__(self, connection, player_id):
         super(Player, self).__init__(connection, 'entity', player_id)
 
@@ -306,6 +312,8 @@ class HostPlayer(BasePlayer):
     and settings of the host player.
     """
 
+    __slots__ = ()
+
     def __init__(self, connection):
         super(HostPlayer, self).__init__(connection, 'player', None)
 
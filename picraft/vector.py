@@ -114,7 +114,7 @@ from __future__ import (
     division,
     )
 str = type('')
-from .compat import range
+from .compat import range, hypot
 
 
 import math
@@ -255,44 +255,44 @@ class Vector(namedtuple('Vector', ('x', 'y', 'z'))):
         return '%s,%s,%s' % (self.x, self.y, self.z)
 
     def __add__(self, other):
-        try:
-            return Vector(self.x + other.x, self.y + other.y, self.z + other.z)
-        except AttributeError:
-            return Vector(self.x + other, self.y + other, self.z + other)
+        if isinstance(other, Vector):
+            ox, oy, oz = other
+            return Vector(self.x + ox, self.y + oy, self.z + oz)
+        return Vector(self.x + other, self.y + other, self.z + other)
 
     __radd__ = __add__
 
     def __sub__(self, other):
-        try:
-            return Vector(self.x - other.x, self.y - other.y, self.z - other.z)
-        except AttributeError:
-            return Vector(self.x - other, self.y - other, self.z - other)
+        if isinstance(other, Vector):
+            ox, oy, oz = other
+            return Vector(self.x - ox, self.y - oy, self.z - oz)
+        return Vector(self.x - other, self.y - other, self.z - other)
 
     def __mul__(self, other):
-        try:
-            return Vector(self.x * other.x, self.y * other.y, self.z * other.z)
-        except AttributeError:
-            return Vector(self.x * other, self.y * other, self.z * other)
+        if isinstance(other, Vector):
+            ox, oy, oz = other
+            return Vector(self.x * ox, self.y * oy, self.z * oz)
+        return Vector(self.x * other, self.y * other, self.z * other)
 
     __rmul__ = __mul__
 
     def __truediv__(self, other):
-        try:
-            return Vector(self.x / other.x, self.y / other.y, self.z / other.z)
-        except AttributeError:
-            return Vector(self.x / other, self.y / other, self.z / other)
+        if isinstance(other, Vector):
+            ox, oy, oz = other
+            return Vector(self.x / ox, self.y / oy, self.z / oz)
+        return Vector(self.x / other, self.y / other, self.z / other)
 
     def __floordiv__(self, other):
-        try:
-            return Vector(self.x // other.x, self.y // other.y, self.z // other.z)
-        except AttributeError:
-            return Vector(self.x // other, self.y // other, self.z // other)
+        if isinstance(other, Vector):
+            ox, oy, oz = other
+            return Vector(self.x // ox, self.y // oy, self.z // oz)
+        return Vector(self.x // other, self.y // other, self.z // other)
 
     def __mod__(self, other):
-        try:
-            return Vector(self.x % other.x, self.y % other.y, self.z % other.z)
-        except AttributeError:
-            return Vector(self.x % other, self.y % other, self.z % other)
+        if isinstance(other, Vector):
+            ox, oy, oz = other
+            return Vector(self.x % ox, self.y % oy, self.z % oz)
+        return Vector(self.x % other, self.y % other, self.z % other)
 
     def __pow__(self, other, modulo=None):
         if modulo is not None:
@@ -474,7 +474,7 @@ class Vector(namedtuple('Vector', ('x', 'y', 'z'))):
 
         .. _Pythagoras' theorem: http://en.wikipedia.org/wiki/Pythagorean_theorem
         """
-        return (other - self).magnitude
+        return hypot(other.x - self.x, other.y - self.y, other.z - self.z)
 
     def angle_between(self, other):
         """
@@ -568,7 +568,7 @@ class Vector(namedtuple('Vector', ('x', 'y', 'z'))):
             >>> Vector().distance_to(Vector(2, 4, 4))
             6.0
         """
-        return math.sqrt(self.x ** 2 + self.y ** 2 + self.z ** 2)
+        return hypot(self.x, self.y, self.z)
 
     @property
     def unit(self):
@@ -801,12 +801,13 @@ class vector_range(Sequence):
             yield self[i]
 
     def __contains__(self, value):
-        try:
-            self.index(value)
-        except ValueError:
-            return False
-        else:
-            return True
+        # A vector range is the product of its axis ranges, so membership is
+        # simply membership of each axis' range
+        return (
+                value.x in self._xrange and
+                value.y in self._yrange and
+                value.z in self._zrange
+                )
 
     def __bool__(self):
         return len(self) > 0
@@ -865,21 +866,11 @@ class vector_range(Sequence):
         ranges = self._ranges
         i, j, k = (getattr(value, axis) for axis in self.order)
         try:
-            i_indexes = set(rmod(len(ranges[0]), ranges[0].index(i), range(len(self))))
-            j_indexes = set(
-                    b
-                    for a in rmod(len(ranges[1]), ranges[1].index(j),
-                        range(len(self) // len(ranges[0])))
-                    for b in rdiv(len(ranges[0]), a)
-                    )
-            k_indexes = set(rdiv(len(ranges[0]) * len(ranges[1]), ranges[2].index(k)))
-            result = i_indexes & j_indexes & k_indexes
-            assert len(result) == 1
-            result = next(iter(result))
+            # The inverse of the calculation in __getitem__
+            return ranges[0].index(i) + len(ranges[0]) * (
+                    ranges[1].index(j) + len(ranges[1]) * ranges[2].index(k))
         except ValueError:
             raise ValueError('%r is not in range' % (value,))
-        else:
-            return result
 
     def count(self, value):
         """
@@ -895,50 +886,6 @@ class vector_range(Sequence):
             return 0
 
 
-def rmod(denom, result, num_range):
-    """
-    Calculates the inverse of a mod operation.
-
-    The *denom* parameter specifies the denominator of the original mod (%)
-    operation. In this implementation, *denom* must be greater than 0. The
-    *result* parameter specifies the result of the mod operation. For obvious
-    reasons this value must be in the range ``[0, denom)`` (greater than or
-    equal to zero and less than the denominator).
-
-    Finally, *num_range* specifies the range that the numerator of the original
-    mode operation can lie in. This must be an iterable sorted in ascending
-    order with unique values (e.g. most typically a :func:`range`).
-
-    The function returns the set of potential numerators (guaranteed to be a
-    subset of *num_range*).
-    """
-    if denom <= 0:
-        raise ValueError('invalid denominator')
-    if not (0 <= result < denom):
-        return set()
-    if len(num_range) == 0:
-        return set()
-    assert num_range[-1] >= num_range[0]
-    start = num_range[0] + (result - num_range[0] % denom) % denom
-    stop = num_range.stop
-    return range(start, stop, denom)
-
-
-def rdiv(denom, result):
-    """
-    Calculates the inverse of a div operation.
-
-    The *denom* parameter specifies the denominator of the original div (//)
-    operation. In this implementation, *denom* must be greater than 0. The
-    *result* parameter specifies the result of the div operation.
-
-    The function returns the set of potential numerators.
-    """
-    if denom <= 0:
-        raise ValueError('invalid denominator')
-    return range(result * denom, result * denom + denom)
-
-
 def sign(v):
     """
     Returns the sign of v as -1, 0, or 1; works for scalar values or
@@ -70,7 +70,7 @@ from __future__ import (
 str = type('')
 
 
-from .exc import NotSupported
+from .exc import NotSupported, BatchStarted
 from .connection import Connection
 from .player import HostPlayer, Players
 from .block import Blocks
@@ -334,14 +334,24 @@ class World(object):
             >>> world.say('Hello, world!')
             >>> world.say('The following player IDs exist:\\n%s' %
             ...     '\\n'.join(str(p) for p in world.players))
+
+        All lines are sent to the server in a single batch (unless a batch is
+        already in progress, in which case they simply become part of it).
         """
-        for line in message.splitlines():
-            self.connection.send('chat.post(%s)' % line)
+        try:
+            with self.connection.batch_start():
+                for line in message.splitlines():
+                    self.connection.send('chat.post(%s)' % line)
+        except BatchStarted:
+            # The caller's batch is in progress; just add the lines to it
+            for line in message.splitlines():
+                self.connection.send('chat.post(%s)' % line)
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, exc_tb):
+        self.events.close()
         self.connection.close()
 
     def _get_immutable(self):
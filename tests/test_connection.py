@@ -58,26 +58,53 @@ def test_connection_init_pi():
         select.select.return_value = [False]
         conn = Connection('myhost', 1234)
         conn._socket.connect.assert_called_once_with(('myhost', 1234))
+        conn._socket.setsockopt.assert_any_call(
+            socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn._socket.setsockopt.assert_any_call(
+            socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
         assert conn.server_version == 'minecraft-pi'
 
+def test_connection_repr():
+    with mock.patch('socket.socket'), mock.patch('select.select'):
+        select.select.return_value = [False]
+        conn = Connection('myhost', 1234)
+        conn._socket.getpeername.return_value = ('myhost', 1234)
+        assert repr(conn) == (
+            '<Connection host="myhost", port=1234, server_version="unknown">')
+        assert not conn._socket.sendall.called
+        conn.server_version
+        assert repr(conn) == (
+            '<Connection host="myhost", port=1234, '
+            'server_version="minecraft-pi">')
+
 def test_connection_init_juice():
     with mock.patch('socket.socket'), mock.patch('select.select'):
-        select.select.return_value = [True]
+        select.select.side_effect = [[False], [True]]
         mock_sock = socket.socket()
-        mock_file = mock_sock.makefile()
-        mock_file.readline.return_value = b'Fail\n'
+        mock_sock.recv.return_value = b'Fail\n'
         conn = Connection('myhost', 1234)
         conn._socket.connect.assert_called_once_with(('myhost', 1234))
         assert conn.server_version == 'raspberry-juice'
 
 def test_connection_init_unknown():
     with mock.patch('socket.socket'), mock.patch('select.select'):
-        select.select.return_value = [True]
+        select.select.side_effect = [[False], [True]]
         mock_sock = socket.socket()
-        mock_file = mock_sock.makefile()
-        mock_file.readline.return_value = b'bar\n'
+        mock_sock.recv.return_value = b'bar\n'
+        conn = Connection('myhost', 1234)
         with pytest.raises(CommandError):
-            conn = Connection('myhost', 1234)
+            conn.server_version
+
+def test_connection_init_lazy():
+    with mock.patch('socket.socket'), mock.patch('select.select'):
+        select.select.return_value = [False]
+        conn = Connection('myhost', 1234)
+        assert not conn._socket.sendall.called
+        assert conn.server_version == 'minecraft-pi'
+        conn._socket.sendall.assert_called_once_with(b'foo()\n')
+        # Subsequent queries use the cached version
+        assert conn.server_version == 'minecraft-pi'
+        conn._socket.sendall.assert_called_once_with(b'foo()\n')
 
 def test_connection_close():
     with mock.patch('socket.socket'), mock.patch('select.select'):
@@ -101,56 +128,99 @@ def test_connection_send():
     with mock.patch('socket.socket'), mock.patch('select.select'):
         select.select.return_value = [False]
         conn = Connection('myhost', 1234)
-        conn._wfile.write.reset_mock()
+        conn._socket.sendall.reset_mock()
         conn.send('foo()')
-        conn._wfile.write.assert_called_once_with(b'foo()\n')
+        conn._socket.sendall.assert_called_once_with(b'foo()\n')
+
+def test_connection_send_bytes():
+    with mock.patch('socket.socket'), mock.patch('select.select'):
+        select.select.return_value = [False]
+        conn = Connection('myhost', 1234)
+        conn._socket.sendall.reset_mock()
+        conn.send(b'foo()')
+        conn._socket.sendall.assert_called_once_with(b'foo()\n')
+        conn._socket.sendall.reset_mock()
+        with conn.batch_start():
+            conn.send(b'foo()')
+            conn.send('bar()')
+        conn._socket.sendall.assert_called_once_with(b'foo()\nbar()\n')
 
 def test_connection_send_error():
     with mock.patch('socket.socket'), mock.patch('select.select'):
-        select.select.side_effect = [[False], [True]]
+        select.select.side_effect = [[True]]
         conn = Connection('myhost', 1234, ignore_errors=False)
-        conn._rfile.readline.return_value = b'Fail\n'
+        conn._socket.recv.return_value = b'Fail\n'
         with pytest.raises(ConnectionError):
             conn.send('foo()')
 
 def test_connection_transact():
     with mock.patch('socket.socket'), mock.patch('select.select'):
-        select.select.side_effect = [[False], [True]]
+        select.select.side_effect = [[True]]
         conn = Connection('myhost', 1234, ignore_errors=False)
-        conn._wfile.write.reset_mock()
-        conn._rfile.readline.return_value = b'bar\n'
+        conn._socket.sendall.reset_mock()
+        conn._socket.recv.return_value = b'bar\n'
         result = conn.transact('foo()')
-        conn._wfile.write.assert_called_once_with(b'foo()\n')
+        conn._socket.sendall.assert_called_once_with(b'foo()\n')
         assert result == 'bar'
 
+def test_connection_batch_transact():
+    with mock.patch('socket.socket'), mock.patch('select.select'):
+        select.select.return_value = [True]
+        conn = Connection('myhost', 1234, ignore_errors=False)
+        conn._socket.sendall.reset_mock()
+        conn._socket.recv.side_effect = [b'1,2,3\n4,5', b',6\n']
+        result = conn.batch_transact(['foo()', 'bar()'])
+        conn._socket.sendall.assert_called_once_with(b'foo()\nbar()\n')
+        assert result == ['1,2,3', '4,5,6']
+        assert conn.batch_transact([]) == []
+
+def test_connection_batch_transact_error():
+    with mock.patch('socket.socket'), mock.patch('select.select'):
+        select.select.return_value = [True]
+        conn = Connection('myhost', 1234, ignore_errors=False)
+        conn._socket.recv.side_effect = [b'Fail\n1,2,3\n']
+        with pytest.raises(CommandError):
+            conn.batch_transact(['foo()', 'bar()'])
+        # Both replies must have been consumed
+        assert not conn._rbuf
+
+def test_connection_batch_transact_return_errors():
+    with mock.patch('socket.socket'), mock.patch('select.select'):
+        select.select.return_value = [True]
+        conn = Connection('myhost', 1234, ignore_errors=False)
+        conn._socket.recv.side_effect = [b'Fail\n1,2,3\n']
+        result = conn.batch_transact(['foo()', 'bar()'], return_errors=True)
+        assert isinstance(result[0], CommandError)
+        assert result[1] == '1,2,3'
+
 def test_connection_batch_send():
     with mock.patch('socket.socket'), mock.patch('select.select'):
         select.select.return_value = [False]
         conn = Connection('myhost', 1234)
-        conn._wfile.write.reset_mock()
+        conn._socket.sendall.reset_mock()
         with conn.batch_start():
             conn.send('foo()')
             conn.send('bar()')
             conn.send('baz()')
-        conn._wfile.write.assert_called_once_with(b'foo()\nbar()\nbaz()\n')
+        conn._socket.sendall.assert_called_once_with(b'foo()\nbar()\nbaz()\n')
 
 def test_connection_batch_forget():
     with mock.patch('socket.socket'), mock.patch('select.select'):
         select.select.return_value = [False]
         conn = Connection('myhost', 1234)
-        conn._wfile.write.reset_mock()
+        conn._socket.sendall.reset_mock()
         conn.batch_start()
         conn.send('foo()')
         conn.send('bar()')
         conn.send('baz()')
         conn.batch_forget()
-        assert not conn._wfile.write.called
+        assert not conn._socket.sendall.called
 
 def test_connection_batch_exception():
     with mock.patch('socket.socket'), mock.patch('select.select'):
         select.select.return_value = [False]
         conn = Connection('myhost', 1234)
-        conn._wfile.write.reset_mock()
+        conn._socket.sendall.reset_mock()
         try:
             with conn.batch_start():
                 conn.send('foo()')
@@ -159,7 +229,7 @@ def test_connection_batch_exception():
                 raise Exception('boo')
         except Exception:
             pass
-        assert not conn._wfile.write.called
+        assert not conn._socket.sendall.called
 
 def test_connection_batch_start_fail():
     with mock.patch('socket.socket'), mock.patch('select.select'):
@@ -178,7 +248,7 @@ def test_connection_batch_send_fail():
 
 def test_connection_ignore_errors():
     with mock.patch('socket.socket'), mock.patch('select.select'):
-        select.select.side_effect = [[False], [True], [False]]
+        select.select.side_effect = [[True], [False]]
         conn = Connection('myhost', 1234, ignore_errors=True)
         conn.send('foo()')
         conn._socket.recv.assert_called_once_with(1500)
@@ -40,6 +40,7 @@ import pytest
 import io
 import re
 import picraft.events
+from picraft.exc import NoHandlersWarning, CommandError
 import threading
 import time
 from picraft import (
@@ -57,6 +58,16 @@ except ImportError:
     import mock
 
 
+def test_events_no_instance_dict():
+    player = mock.Mock()
+    for event in (
+            BlockHitEvent(Vector(), 'x+', player),
+            PlayerPosEvent(Vector(), Vector(x=1), player),
+            ChatPostEvent('foo', player),
+            IdleEvent()):
+        with pytest.raises(AttributeError):
+            event.foo = 1
+
 def test_events_poll_gap_attr():
     conn = mock.MagicMock()
     events = picraft.events.Events(conn)
@@ -65,16 +76,43 @@ def test_events_poll_gap_attr():
     events.poll_gap = 0.1
     assert events.poll_gap == 0.1
 
+def test_events_max_poll_gap_attr():
+    conn = mock.MagicMock()
+    events = picraft.events.Events(conn)
+    assert events.max_poll_gap == events.poll_gap
+    events.max_poll_gap = 2
+    assert events.max_poll_gap == 2.0
+    events.max_poll_gap = None
+    events.poll_gap = 0.5
+    assert events.max_poll_gap == 0.5
+
+def test_events_main_loop_backoff():
+    conn = mock.MagicMock()
+    events = picraft.events.Events(conn, poll_gap=0)
+    events.max_poll_gap = 0.02
+    @events.on_idle()
+    def handler(event):
+        pass
+    events._stopped = mock.Mock()
+    events._stopped.wait.side_effect = [False] * 5 + [True]
+    with mock.patch.object(events, 'process') as process, \
+            mock.patch('picraft.events.time.time') as now:
+        process.side_effect = [0, 0, 0, 1, 0, 0]
+        now.return_value = 0.0
+        events.main_loop()
+    assert [c[0][0] for c in events._stopped.wait.call_args_list] == [
+        0.01, 0.015, 0.02, 0.0, 0.01, 0.015]
+
 def test_events_track_players_attr():
-    with mock.patch('picraft.events.Player'):
-        conn = mock.MagicMock()
-        events = picraft.events.Events(conn)
-        events.track_players = 1
-        assert set(events.track_players) == {1}
-        events.track_players = {1, 2, 3}
-        assert set(events.track_players) == {1, 2, 3}
-        with pytest.raises(ValueError):
-            events.track_players = 1.0
+    conn = mock.MagicMock()
+    conn.batch_transact.side_effect = lambda cmds: ['0,0,0' for cmd in cmds]
+    events = picraft.events.Events(conn)
+    events.track_players = 1
+    assert set(events.track_players) == {1}
+    events.track_players = {1, 2, 3}
+    assert set(events.track_players) == {1, 2, 3}
+    with pytest.raises(ValueError):
+        events.track_players = 1.0
 
 def test_events_include_idle_attr():
     conn = mock.MagicMock()
@@ -86,14 +124,15 @@ def test_events_include_idle_attr():
 
 def test_events_poll_empty():
     conn = mock.MagicMock()
-    conn.transact.return_value = ''
+    conn.batch_transact.return_value = ['']
     events = picraft.events.Events(conn)
     assert events.poll() == []
-    conn.transact.assert_called_once_with('events.block.hits()')
+    conn.batch_transact.assert_called_once_with(
+        ['events.block.hits()'], return_errors=True)
 
 def test_events_poll_one_hit():
     conn = mock.MagicMock()
-    conn.transact.return_value = '1,2,3,4,5'
+    conn.batch_transact.return_value = ['1,2,3,4,5']
     events = picraft.events.Events(conn)
     result = events.poll()
     assert len(result) == 1
@@ -101,11 +140,12 @@ def test_events_poll_one_hit():
     assert result[0].pos == Vector(1, 2, 3)
     assert result[0].face == 'x-'
     assert result[0].player.player_id == 5
-    conn.transact.assert_called_once_with('events.block.hits()')
+    conn.batch_transact.assert_called_once_with(
+        ['events.block.hits()'], return_errors=True)
 
 def test_events_poll_one_move():
     conn = mock.MagicMock()
-    conn.transact.side_effect = ['1.0,1.0,1.0', '1.1,1.0,1.0', '']
+    conn.batch_transact.side_effect = [['1.0,1.0,1.0'], ['1.1,1.0,1.0', '']]
     events = picraft.events.Events(conn)
     events.track_players = {1}
     result = events.poll()
@@ -114,15 +154,100 @@ def test_events_poll_one_move():
     assert result[0].old_pos == Vector(1.0, 1.0, 1.0)
     assert result[0].new_pos == Vector(1.1, 1.0, 1.0)
     assert result[0].player.player_id == 1
-    conn.transact.assert_has_calls([
-        mock.call('entity.getPos(1)'),
-        mock.call('entity.getPos(1)'),
-        mock.call('events.block.hits()'),
-        ])
+    assert not conn.transact.called
+    assert conn.batch_transact.call_count == 2
+    conn.batch_transact.assert_called_with(
+        ['entity.getPos(1)', 'events.block.hits()'], return_errors=True)
+
+def test_events_poll_many_moves():
+    conn = mock.MagicMock()
+    conn.batch_transact.side_effect = [
+        ['1.0,1.0,1.0', '2.0,1.0,1.0'],
+        ['1.0,1.0,1.0', '2.0,1.0,1.5', ''],
+        ]
+    events = picraft.events.Events(conn)
+    events.track_players = [1, 2]
+    result = events.poll()
+    assert len(result) == 1
+    assert result[0].old_pos == Vector(2.0, 1.0, 1.0)
+    assert result[0].new_pos == Vector(2.0, 1.0, 1.5)
+    assert result[0].player.player_id == 2
+    assert conn.batch_transact.call_count == 2
+
+def test_events_poll_unchanged_pos():
+    conn = mock.MagicMock()
+    conn.batch_transact.side_effect = [['1.0,1.0,1.0'], ['1.0,1.0,1.0', '']]
+    events = picraft.events.Events(conn)
+    events.track_players = {1}
+    with mock.patch('picraft.events.Vector.from_string') as from_string:
+        assert events.poll() == []
+        assert not from_string.called
+
+def test_events_process_pos_handler_error():
+    conn = mock.MagicMock()
+    conn.batch_transact.side_effect = [
+        ['1.0,1.0,1.0'],
+        ['2.0,1.0,1.0', ''],
+        ['3.0,1.0,1.0', ''],
+        ]
+    events = picraft.events.Events(conn)
+    events.track_players = {1}
+    result = []
+    @events.on_player_pos()
+    def handler(event):
+        result.append(event)
+        if len(result) == 1:
+            raise ValueError('handler failed')
+    with pytest.raises(ValueError):
+        events.process()
+    events.process()
+    assert len(result) == 2
+    assert result[1].old_pos == Vector(2, 1, 1)
+    assert result[1].new_pos == Vector(3, 1, 1)
+
+def test_events_poll_tracked_player():
+    conn = mock.MagicMock()
+    conn.batch_transact.side_effect = [
+        ['1.0,1.0,1.0'],
+        ['2.0,1.0,1.0', ''],
+        ['3.0,1.0,1.0', ''],
+        ]
+    events = picraft.events.Events(conn)
+    with mock.patch('picraft.events.Player', wraps=picraft.events.Player) as p:
+        events.track_players = {1}
+        result = events.poll() + events.poll()
+        p.assert_called_once_with(conn, 1)
+    assert len(result) == 2
+    assert result[0].player is result[1].player
+    assert result[1].old_pos == Vector(2, 1, 1)
+
+def test_events_poll_pos_error():
+    conn = mock.MagicMock()
+    conn.server_version = 'raspberry-juice'
+    conn.batch_transact.side_effect = [
+        ['1.0,1.0,1.0', '1.0,1.0,1.0'],
+        [CommandError('an error occurred'), '2.0,1.0,1.0', '1,2,3,4,2', '2,Hi'],
+        ]
+    events = picraft.events.Events(conn)
+    events.track_players = {1, 2}
+    result = events.poll()
+    assert len(result) == 3
+    assert isinstance(result[0], PlayerPosEvent)
+    assert result[0].player.player_id == 2
+    assert isinstance(result[1], BlockHitEvent)
+    assert isinstance(result[2], ChatPostEvent)
+    assert events.track_players == {2}
+
+def test_events_poll_hits_error():
+    conn = mock.MagicMock()
+    conn.batch_transact.return_value = [CommandError('an error occurred')]
+    events = picraft.events.Events(conn)
+    with pytest.raises(CommandError):
+        events.poll()
 
 def test_events_poll_multi_hits():
     conn = mock.MagicMock()
-    conn.transact.return_value = '1,2,3,4,5|-1,0,0,0,1'
+    conn.batch_transact.return_value = ['1,2,3,4,5|-1,0,0,0,1']
     events = picraft.events.Events(conn)
     result = events.poll()
     assert len(result) == 2
@@ -132,11 +257,42 @@ def test_events_poll_multi_hits():
     assert result[1].pos == Vector(-1, 0, 0)
     assert result[1].face == 'y-'
     assert result[1].player.player_id == 1
-    conn.transact.assert_called_once_with('events.block.hits()')
+    conn.batch_transact.assert_called_once_with(
+        ['events.block.hits()'], return_errors=True)
+
+def test_events_poll_player_cache():
+    conn = mock.MagicMock()
+    conn.batch_transact.return_value = ['1,2,3,4,5|-1,0,0,0,5']
+    events = picraft.events.Events(conn)
+    result = events.poll() + events.poll()
+    assert len(result) == 4
+    assert all(e.player is result[0].player for e in result)
+
+def test_events_process_player_cache():
+    conn = mock.MagicMock()
+    conn.batch_transact.return_value = ['1,2,3,4,5']
+    events = picraft.events.Events(conn)
+    result = []
+    @events.on_block_hit()
+    def handler(event):
+        result.append(event.player.player_id)
+    with mock.patch('picraft.events.Player', wraps=picraft.events.Player) as p:
+        for i in range(5):
+            events.process()
+        assert result == [5] * 5
+        p.assert_called_once_with(conn, 5)
+
+def test_events_poll_pos_cache():
+    conn = mock.MagicMock()
+    conn.batch_transact.return_value = ['1,2,3,4,5|1,2,3,0,1|-1,0,0,0,5']
+    events = picraft.events.Events(conn)
+    result = events.poll()
+    assert result[0].pos is result[1].pos
+    assert result[2].pos == Vector(-1, 0, 0)
 
 def test_events_poll_idle():
     conn = mock.MagicMock()
-    conn.transact.return_value = ''
+    conn.batch_transact.return_value = ['']
     events = picraft.events.Events(conn)
     events.include_idle = True
     result = events.poll()
@@ -146,14 +302,14 @@ def test_events_poll_idle():
 def test_events_post_message():
     conn = mock.MagicMock()
     conn.server_version = 'raspberry-juice'
-    conn.transact.side_effect = ['', '1,Hello world!']
+    conn.batch_transact.return_value = ['', '1,Hello world!']
     events = picraft.events.Events(conn)
     result = events.poll()
     assert len(result) == 1
     assert result[0].message == 'Hello world!'
     assert result[0].player.player_id == 1
-    conn.transact.assert_any_call('events.block.hits()')
-    conn.transact.assert_any_call('events.chat.posts()')
+    conn.batch_transact.assert_called_once_with(
+        ['events.block.hits()', 'events.chat.posts()'], return_errors=True)
 
 def test_events_clear():
     conn = mock.MagicMock()
@@ -161,9 +317,23 @@ def test_events_clear():
     events.clear()
     conn.send.assert_called_once_with('events.clear()')
 
+def test_events_clear_tracked():
+    conn = mock.MagicMock()
+    conn.batch_transact.side_effect = [
+        ['1.0,1.0,1.0', '2.0,2.0,2.0'],
+        ['3.0,3.0,3.0', '4.0,4.0,4.0'],
+        ['3.0,3.0,3.0', '4.0,4.0,4.0', ''],
+        ]
+    events = picraft.events.Events(conn)
+    events.track_players = [1, 2]
+    assert events.track_players == frozenset({1, 2})
+    events.clear()
+    conn.send.assert_called_once_with('events.clear()')
+    assert events.poll() == []
+
 def test_events_idle_decorator():
     conn = mock.MagicMock()
-    conn.transact.return_value = ''
+    conn.batch_transact.return_value = ['']
     events = picraft.events.Events(conn)
     events.include_idle = True
     result = []
@@ -175,7 +345,7 @@ def test_events_idle_decorator():
 
 def test_events_pos_decorator():
     conn = mock.MagicMock()
-    conn.transact.side_effect = ['1.0,1.0,1.0', '1.1,1.0,1.0', '']
+    conn.batch_transact.side_effect = [['1.0,1.0,1.0'], ['1.1,1.0,1.0', '']]
     events = picraft.events.Events(conn)
     events.track_players = {1}
     result = []
@@ -190,7 +360,7 @@ def test_events_pos_decorator():
 
 def test_events_hit_decorator():
     conn = mock.MagicMock()
-    conn.transact.return_value = '1,2,3,4,5'
+    conn.batch_transact.return_value = ['1,2,3,4,5']
     events = picraft.events.Events(conn)
     result = []
     @events.on_block_hit()
@@ -205,7 +375,7 @@ def test_events_hit_decorator():
 def test_events_chat_decorator():
     conn = mock.MagicMock()
     conn.server_version = 'raspberry-juice'
-    conn.transact.side_effect = ['', '1,Hello world!']
+    conn.batch_transact.return_value = ['', '1,Hello world!']
     events = picraft.events.Events(conn)
     result = []
     @events.on_chat_post()
@@ -216,9 +386,151 @@ def test_events_chat_decorator():
     assert result[0].message == 'Hello world!'
     assert result[0].player.player_id == 1
 
+def test_events_conflate():
+    conn = mock.MagicMock()
+    conn.batch_transact.return_value = ['1,2,3,4,5|1,2,3,4,5|-1,0,0,0,1|1,2,3,4,5']
+    events = picraft.events.Events(conn)
+    assert not events.conflate
+    assert len(events.poll()) == 4
+    events.conflate = True
+    assert events.conflate
+    result = events.poll()
+    assert len(result) == 2
+    assert result[0].pos == Vector(1, 2, 3)
+    assert result[1].pos == Vector(-1, 0, 0)
+
+def test_events_player_backoff():
+    conn = mock.MagicMock()
+    hits = []
+    queries = []
+    def batch_transact(cmds, return_errors=False):
+        queries.append([cmd for cmd in cmds if cmd.startswith('entity.')])
+        return ['1.0,1.0,1.0' for cmd in queries[-1]] + [
+            hits.pop() if hits else '']
+    conn.batch_transact.side_effect = batch_transact
+    events = picraft.events.Events(conn)
+    events.track_players = {1}
+    events.player_backoff = True
+    assert events.player_backoff
+    del queries[:]
+    for i in range(8):
+        events.poll()
+    # Stationary players are queried after gaps of 1, 3, 7, ... polls
+    assert [bool(q) for q in queries] == [
+        True, False, True, False, False, False, True, False]
+    hits.append('1,2,3,4,1')
+    del queries[:]
+    events.poll()
+    events.poll()
+    assert queries[-1] == ['entity.getPos(1)']
+
+def test_events_process_count():
+    conn = mock.MagicMock()
+    conn.batch_transact.return_value = ['1,2,3,4,5|-1,0,0,0,1']
+    events = picraft.events.Events(conn)
+    events.include_idle = True
+    @events.on_block_hit()
+    def handler(event):
+        pass
+    assert events.process() == 2
+    conn.batch_transact.return_value = ['']
+    assert events.process() == 0
+
+def test_events_process_unhandled_pos():
+    conn = mock.MagicMock()
+    conn.batch_transact.side_effect = [
+        ['1.0,1.0,1.0'],
+        ['2.0,1.0,1.0', ''],
+        ]
+    events = picraft.events.Events(conn)
+    events.track_players = {1}
+    @events.on_block_hit()
+    def handler(event):
+        pass
+    assert events.process() == 0
+
+def test_events_process_unhandled_types():
+    conn = mock.MagicMock()
+    conn.server_version = 'raspberry-juice'
+    conn.batch_transact.return_value = ['1,2,3,4,5', '1,Hello world!']
+    events = picraft.events.Events(conn)
+    events.include_idle = True
+    result = []
+    @events.on_chat_post()
+    def chat_handler(event):
+        result.append(event)
+    @events.on_idle()
+    def idle_handler(event):
+        result.append(event)
+    with mock.patch('picraft.events.BlockHitEvent.from_string') as from_string:
+        assert events.process() == 1
+        assert not from_string.called
+    # The unparsed block hit still means the poll wasn't idle
+    assert len(result) == 1
+    assert result[0].message == 'Hello world!'
+
+def test_events_process_no_handlers():
+    conn = mock.MagicMock()
+    events = picraft.events.Events(conn)
+    assert events.process() == 0
+    assert not conn.batch_transact.called
+    events.stop()
+    with pytest.warns(NoHandlersWarning):
+        events.main_loop()
+    assert not conn.batch_transact.called
+
+def test_events_block_handler_index():
+    conn = mock.MagicMock()
+    conn.batch_transact.return_value = ['1,2,3,4,5|-1,0,0,0,1']
+    events = picraft.events.Events(conn)
+    result = []
+    @events.on_block_hit(pos=Vector(1, 2, 3))
+    def handler1(event):
+        result.append((1, event.pos))
+    @events.on_block_hit()
+    def handler2(event):
+        result.append((2, event.pos))
+    @events.on_block_hit(pos=Vector(1, 2, 3), face='x+')
+    def handler3(event):
+        result.append((3, event.pos))
+    @events.on_block_hit(pos=[Vector(-1, 0, 0)])
+    def handler4(event):
+        result.append((4, event.pos))
+    events.process()
+    assert result == [
+        (1, Vector(1, 2, 3)),
+        (2, Vector(1, 2, 3)),
+        (2, Vector(-1, 0, 0)),
+        (4, Vector(-1, 0, 0)),
+        ]
+
+def test_events_class_handlers():
+    conn = mock.MagicMock()
+    conn.batch_transact.return_value = ['1,2,3,4,5']
+    events = picraft.events.Events(conn)
+    result = []
+    @events.has_handlers
+    class Foo(object):
+        def __init__(self, name):
+            self.name = name
+        @events.on_block_hit()
+        def hit(self, event):
+            result.append(self.name)
+    class Bar(Foo):
+        pass
+    foo1 = Foo('foo1')
+    foo2 = Foo('foo2')
+    bar = Bar('bar')
+    events.process()
+    assert sorted(result) == ['foo1', 'foo2']
+    del result[:]
+    del foo2
+    events.process()
+    assert result == ['foo1']
+
 def test_events_multi_thread_handler():
     conn = mock.MagicMock()
-    conn.transact.return_value = '1,2,3,4,5|-1,0,0,0,1'
+    conn.batch_transact.return_value = ['1,2,3,4,5|-1,0,0,0,1']
     events = picraft.events.Events(conn)
     result = []
     lock = threading.Lock()
@@ -248,7 +560,7 @@ def test_events_multi_thread_handler():
 
 def test_events_multi_thread_single_exec_handler():
     conn = mock.MagicMock()
-    conn.transact.return_value = '1,2,3,4,5|-1,0,0,0,1'
+    conn.batch_transact.return_value = ['1,2,3,4,5|-1,0,0,0,1']
     events = picraft.events.Events(conn)
     result = []
     @events.on_block_hit(thread=True, multi=False)
@@ -263,9 +575,131 @@ def test_events_multi_thread_single_exec_handler():
     assert result[0].face == 'x-'
     assert result[0].player.player_id == 5
 
+def test_events_handler_pool():
+    pool = picraft.events.HandlerPool(max_threads=2)
+    result = []
+    lock = threading.Lock()
+    done = threading.Event()
+    def action(i):
+        with lock:
+            result.append((i, threading.current_thread()))
+            if len(result) == 10:
+                done.set()
+    for i in range(10):
+        pool.submit(action, (i,))
+    assert done.wait(2)
+    assert sorted(i for i, t in result) == list(range(10))
+    assert len(set(t for i, t in result)) <= 2
+
+def test_events_handler_pool_burst():
+    pool = picraft.events.HandlerPool(max_threads=4)
+    done = threading.Event()
+    assert pool.submit(done.set)
+    assert done.wait(2)
+    # Wait for the worker to become idle, then check that a burst of calls
+    # runs in parallel rather than all being handed to that one worker
+    timeout = time.time() + 2
+    while pool._idle < 1 and time.time() < timeout:
+        time.sleep(0.01)
+    assert pool._idle == 1
+    lock = threading.Lock()
+    started = []
+    all_started = threading.Event()
+    release = threading.Event()
+    def action(i):
+        with lock:
+            started.append(i)
+            if len(started) == 3:
+                all_started.set()
+        release.wait(2)
+    for i in range(3):
+        assert pool.submit(action, (i,))
+    try:
+        assert all_started.wait(1)
+    finally:
+        release.set()
+    assert len(pool._threads) == 3
+
+def test_events_handler_pool_full():
+    pool = picraft.events.HandlerPool(max_threads=1, max_queue=1)
+    started = threading.Event()
+    release = threading.Event()
+    def action():
+        started.set()
+        release.wait(2)
+    assert pool.submit(action)
+    assert started.wait(2)
+    assert pool.submit(action)
+    assert not pool.submit(action)
+    release.set()
+
+def test_events_handler_pool_shutdown():
+    pool = picraft.events.HandlerPool(max_threads=2)
+    done = threading.Event()
+    assert pool.submit(done.set)
+    assert done.wait(2)
+    threads = list(pool._threads)
+    pool.shutdown()
+    for thread in threads:
+        thread.join(2)
+        assert not thread.is_alive()
+    assert pool._threads == []
+    done.clear()
+    assert pool.submit(done.set)
+    assert done.wait(2)
+
+def test_events_handler_pool_shutdown_gate():
+    pool = picraft.events.HandlerPool(max_threads=1)
+    started = threading.Event()
+    release = threading.Event()
+    def blocker():
+        started.set()
+        release.wait(2)
+    result = []
+    done = threading.Event()
+    def action(event):
+        result.append(event)
+        done.set()
+    handler = picraft.events.EventHandler(action, True, False, pool)
+    try:
+        assert pool.submit(blocker)
+        assert started.wait(2)
+        handler.execute(1)
+        assert handler._running.locked()
+        pool.shutdown()
+        assert not handler._running.locked()
+    finally:
+        release.set()
+    handler.execute(2)
+    assert done.wait(2)
+    assert result == [2]
+
+def test_events_close():
+    conn = mock.MagicMock()
+    events = picraft.events.Events(conn)
+    with mock.patch.object(events._pool, 'shutdown') as shutdown:
+        events.close()
+        shutdown.assert_called_once_with()
+    assert events._stopped.is_set()
+
+def test_events_block_handler_mutable_set():
+    conn = mock.MagicMock()
+    conn.batch_transact.return_value = ['1,2,3,1,1']
+    events = picraft.events.Events(conn)
+    positions = set()
+    result = []
+    @events.on_block_hit(pos=positions)
+    def handler(event):
+        result.append(event)
+    events.process()
+    assert len(result) == 0
+    positions.add(Vector(1, 2, 3))
+    events.process()
+    assert len(result) == 1
+
 def test_events_pos_handler_filter_one():
     conn = mock.MagicMock()
-    conn.transact.side_effect = ['1.0,1.0,1.0', '1.1,1.0,1.0', '']
+    conn.batch_transact.side_effect = [['1.0,1.0,1.0'], ['1.1,1.0,1.0', '']]
     events = picraft.events.Events(conn)
     events.track_players = {1}
     result = []
@@ -277,7 +711,7 @@ def test_events_pos_handler_filter_one():
 
 def test_events_pos_handler_filter_many():
     conn = mock.MagicMock()
-    conn.transact.side_effect = ['1.0,1.0,1.0', '1.1,1.0,1.0', '']
+    conn.batch_transact.side_effect = [['1.0,1.0,1.0'], ['1.1,1.0,1.0', '']]
     events = picraft.events.Events(conn)
     events.track_players = {1}
     result = []
@@ -292,19 +726,18 @@ def test_events_pos_handler_filter_many():
 
 def test_events_pos_handler_filter_bad():
     conn = mock.MagicMock()
-    conn.transact.side_effect = ['1.0,1.0,1.0', '1.1,1.0,1.0', '']
+    conn.batch_transact.side_effect = [['1.0,1.0,1.0'], ['1.1,1.0,1.0', '']]
     events = picraft.events.Events(conn)
     events.track_players = {1}
     result = []
-    @events.on_player_pos(old_pos=1)
-    def handler(event):
-        result.append(event)
     with pytest.raises(TypeError):
-        events.process()
+        @events.on_player_pos(old_pos=1)
+        def handler(event):
+            result.append(event)
 
 def test_events_hit_handler_filter_one():
     conn = mock.MagicMock()
-    conn.transact.return_value = '1,2,3,4,5'
+    conn.batch_transact.return_value = ['1,2,3,4,5']
     events = picraft.events.Events(conn)
     result = []
     @events.on_block_hit(pos=Vector(1, 2, 3), face='x-')
@@ -316,9 +749,34 @@ def test_events_hit_handler_filter_one():
     assert result[0].face == 'x-'
     assert result[0].player.player_id == 5
 
+def test_events_hit_handler_constructed_event():
+    pool = picraft.events.HandlerPool()
+    handler = picraft.events.BlockHitHandler(
+        lambda event: None, False, True, pool, None, 'x+')
+    # Faces from events constructed manually needn't be the objects used by
+    # BlockHitEvent.from_string
+    face = ''.join(['x', '+'])
+    assert handler.matches(BlockHitEvent(Vector(1, 2, 3), face, None))
+    assert not handler.matches(BlockHitEvent(Vector(1, 2, 3), 'x-', None))
+
+def test_events_handler_unfiltered():
+    pool = picraft.events.HandlerPool()
+    action = lambda event: None
+    for handler in (
+            picraft.events.PlayerPosHandler(
+                action, False, True, pool, None, None),
+            picraft.events.BlockHitHandler(
+                action, False, True, pool, None, None),
+            picraft.events.ChatPostHandler(
+                action, False, True, pool, None),
+            picraft.events.IdleHandler(action, False, True, pool)):
+        # Handlers without filters needn't examine events at all
+        assert handler._matches is picraft.events._match_any
+        assert handler.matches(None)
+
 def test_events_hit_handler_filter_many():
     conn = mock.MagicMock()
-    conn.transact.return_value = '1,2,3,4,5'
+    conn.batch_transact.return_value = ['1,2,3,4,5']
     events = picraft.events.Events(conn)
     result = []
     @events.on_block_hit(pos=[Vector(0, 0, 0), Vector(1, 2, 3)], face=['x+', 'x-'])
@@ -332,29 +790,27 @@ def test_events_hit_handler_filter_many():
 
 def test_events_hit_handler_filter_bad1():
     conn = mock.MagicMock()
-    conn.transact.return_value = '1,2,3,4,5'
+    conn.batch_transact.return_value = ['1,2,3,4,5']
     events = picraft.events.Events(conn)
     result = []
-    @events.on_block_hit(pos=1, face=['x+', 'x-'])
-    def handler(event):
-        result.append(event)
     with pytest.raises(TypeError):
-        events.process()
+        @events.on_block_hit(pos=1, face=['x+', 'x-'])
+        def handler(event):
+            result.append(event)
 
 def test_events_hit_handler_filter_bad2():
     conn = mock.MagicMock()
-    conn.transact.return_value = '1,2,3,4,5'
+    conn.batch_transact.return_value = ['1,2,3,4,5']
     events = picraft.events.Events(conn)
     result = []
-    @events.on_block_hit(pos=Vector(1, 2, 3), face=False)
-    def handler(event):
-        result.append(event)
     with pytest.raises(TypeError):
-        events.process()
+        @events.on_block_hit(pos=Vector(1, 2, 3), face=False)
+        def handler(event):
+            result.append(event)
 
 def test_events_hit_handler_filter_face_bytes():
     conn = mock.MagicMock()
-    conn.transact.return_value = '1,2,3,4,5'
+    conn.batch_transact.return_value = ['1,2,3,4,5']
     events = picraft.events.Events(conn)
     result = []
     @events.on_block_hit(pos=Vector(1, 2, 3), face=b'y-')
@@ -366,7 +822,7 @@ def test_events_hit_handler_filter_face_bytes():
 def test_events_chat_handler_filter_message():
     conn = mock.MagicMock()
     conn.server_version = 'raspberry-juice'
-    conn.transact.side_effect = ['', '1,teleport']
+    conn.batch_transact.return_value = ['', '1,teleport']
     events = picraft.events.Events(conn)
     result = []
     @events.on_chat_post(message='teleport')
@@ -380,7 +836,7 @@ def test_events_chat_handler_filter_message():
 def test_events_chat_handler_filter_message_re():
     conn = mock.MagicMock()
     conn.server_version = 'raspberry-juice'
-    conn.transact.side_effect = ['', '1,teleport 0,0,0']
+    conn.batch_transact.return_value = ['', '1,teleport 0,0,0']
     events = picraft.events.Events(conn)
     result = []
     @events.on_chat_post(message=re.compile(r'teleport \d+,\d+,\d+'))
@@ -394,7 +850,7 @@ def test_events_chat_handler_filter_message_re():
 def test_events_chat_handler_filter_message_bytes():
     conn = mock.MagicMock()
     conn.server_version = 'raspberry-juice'
-    conn.transact.side_effect = ['', '1,teleport']
+    conn.batch_transact.return_value = ['', '1,teleport']
     events = picraft.events.Events(conn)
     result = []
     @events.on_chat_post(message=b'teleport')
@@ -408,25 +864,36 @@ def test_events_chat_handler_filter_message_bytes():
 def test_events_chat_handler_filter_message_bad():
     conn = mock.MagicMock()
     conn.server_version = 'raspberry-juice'
-    conn.transact.side_effect = ['', '1,teleport']
+    conn.batch_transact.return_value = ['', '1,teleport']
     events = picraft.events.Events(conn)
     result = []
-    @events.on_chat_post(message=1)
-    def handler(event):
-        result.append(event)
     with pytest.raises(TypeError):
-        events.process()
+        @events.on_chat_post(message=1)
+        def handler(event):
+            result.append(event)
 
 def test_events_main_loop():
     conn = mock.MagicMock()
-    conn.transact.return_value = ''
+    conn.batch_transact.return_value = ['']
     events = picraft.events.Events(conn)
     events.include_idle = True
     @events.on_idle()
     def handler(event):
-        conn.transact.side_effect=ConnectionClosed()
+        conn.batch_transact.side_effect=ConnectionClosed()
     main_loop_thread = threading.Thread(target=events.main_loop)
     main_loop_thread.start()
     main_loop_thread.join(timeout=1)
     assert not main_loop_thread.is_alive()
 
+def test_events_main_loop_stop():
+    conn = mock.MagicMock()
+    conn.batch_transact.return_value = ['']
+    events = picraft.events.Events(conn, poll_gap=10)
+    events.include_idle = True
+    @events.on_idle()
+    def handler(event):
+        events.stop()
+    main_loop_thread = threading.Thread(target=events.main_loop)
+    main_loop_thread.start()
+    main_loop_thread.join(timeout=1)
+    assert not main_loop_thread.is_alive()
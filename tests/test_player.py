@@ -46,6 +46,12 @@ except ImportError:
     import mock
 
 
+def test_player_slots():
+    conn = mock.MagicMock()
+    for player in (Player(conn, 1), HostPlayer(conn)):
+        with pytest.raises(AttributeError):
+            player.__dict__
+
 def test_players_len():
     conn = mock.MagicMock()
     conn.transact.return_value = '1|2|3'
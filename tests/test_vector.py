@@ -40,7 +40,7 @@ import pytest
 import math
 from conftest import fp_equal, fp_vectors_equal
 from picraft import Vector, vector_range, line, lines, circle, sphere, filled, O, X, Y, Z, V
-from picraft.vector import rmod, rdiv, sign
+from picraft.vector import sign
 from picraft.compat import range
 
 
@@ -67,6 +67,8 @@ def test_vector_add():
     assert Vector() + Vector(1, 2, 3) == Vector(1,2, 3)
     assert Vector() + 1 == Vector(1, 1, 1)
     assert 1 + Vector() == Vector(1, 1, 1)
+    with pytest.raises(TypeError):
+        Vector() + (1, 2, 3)
 
 def test_vector_sub():
     assert Vector(1, 2, 3) - Vector(1, 1, 1) == Vector(0, 1, 2)
@@ -272,6 +274,25 @@ def test_vector_range_contains():
     assert Vector(x=1) in vector_range(Vector() + 2, order='xyz')
     assert Vector() + 2 not in vector_range(Vector() + 2)
 
+def test_vector_range_index_all():
+    # Check membership and index against the vectors actually produced by
+    # iteration, including negative and uneven steps, in every order
+    outside = vector_range(Vector(-3, -3, -3), Vector(5, 5, 5))
+    for order in ('xyz', 'xzy', 'yxz', 'yzx', 'zxy', 'zyx'):
+        for v in (
+                vector_range(Vector(3, 2, 4), order=order),
+                vector_range(Vector(0, 3, 1), Vector(4, -1, 3),
+                             Vector(2, -1, 1), order=order)):
+            members = list(v)
+            for i, vec in enumerate(members):
+                assert vec in v
+                assert v.index(vec) == i
+            for vec in outside:
+                if vec not in members:
+                    assert vec not in v
+                    with pytest.raises(ValueError):
+                        v.index(vec)
+
 def test_vector_range_count():
     assert vector_range(Vector() + 2).count(Vector()) == 1
     assert vector_range(Vector() + 2).count(Vector(1, 1, 1)) == 1
@@ -353,15 +374,6 @@ def test_vector_getslice():
     with pytest.raises(ValueError):
         v[::Vector(1, 1, 0)]
 
-def test_vector_coverage():
-    # Miscellaneous tests purely for the sake of coverage
-    assert rmod(3, 3, range(10)) == set()
-    assert rmod(3, 2, []) == set()
-    with pytest.raises(ValueError):
-        rmod(0, 1, range(10))
-    with pytest.raises(ValueError):
-        rdiv(0, 1)
-
 def test_vector_sign():
     assert sign(10) == 1
     assert sign(0) == 0
@@ -42,7 +42,7 @@ import picraft.world
 import picraft.block
 import picraft.player
 import picraft.events
-from picraft import World, Vector, vector_range, Connection, NotSupported
+from picraft import World, Vector, vector_range, Connection, NotSupported, BatchStarted
 try:
     from unittest import mock
 except ImportError:
@@ -74,6 +74,17 @@ def test_world_say():
         World().say('Hello\nworld!')
         c().send.assert_any_call('chat.post(Hello)')
         c().send.assert_any_call('chat.post(world!)')
+        assert c().batch_start.call_count == 2
+        batch = c().batch_start.return_value
+        batch.__exit__.assert_called_with(None, None, None)
+
+def test_world_say_in_batch():
+    with mock.patch('picraft.world.Connection') as c:
+        c().batch_start.side_effect = BatchStarted('batch already started')
+        World().say('Hello\nworld!')
+        c().send.assert_any_call('chat.post(Hello)')
+        c().send.assert_any_call('chat.post(world!)')
+        assert not c().batch_start.return_value.__exit__.called
 
 def test_world_context():
     with mock.patch('picraft.world.Connection') as c: